@@ -22,12 +22,33 @@ DEFAULTS = {
 
     'TOKEN_MODEL': 'rest_framework.authtoken.models.Token',
     'TOKEN_CREATOR': 'dj_rest_auth.utils.default_create_token',
+    'TOKEN_HASH_SECRET': None,
+    'TOKEN_LAST_USED_RESOLUTION': 60,
+    'TOKEN_LAST_USED_FLUSH_INTERVAL': 60,
+    'TOKEN_EXPIRY': 14 * 24 * 3600,
+    'TOKEN_RENEWAL_WINDOW': 3600,
 
     'PASSWORD_RESET_USE_SITES_DOMAIN': False,
     'OLD_PASSWORD_FIELD_ENABLED': False,
     'LOGOUT_ON_PASSWORD_CHANGE': False,
     'SESSION_LOGIN': True,
+    'SESSION_LOGIN_SKIP_HEADER': None,
     'USE_JWT': False,
+    'STATELESS_EMAIL_VERIFICATION': False,
+    'RESEND_EMAIL_COOLDOWN': None,
+    'USER_DETAILS_CACHE_TIMEOUT': None,
+    'FAST_JSON_RENDERER': False,
+
+    'STATELESS_SOCIAL_LOGIN': False,
+    'SOCIAL_HTTP_POOL_SIZE': 10,
+    'SOCIAL_HTTP_TIMEOUT': None,
+    'SOCIAL_METADATA_CACHE_TIMEOUT': 3600,
+    'SOCIAL_METADATA_URLS': (
+        'https://www.googleapis.com/oauth2/v1/certs',
+        'https://appleid.apple.com/auth/keys',
+    ),
+    'SOCIAL_ACCOUNT_LIST_PAGE_SIZE': None,
+    'SOCIAL_ACCOUNT_LIST_CACHE_TIMEOUT': None,
 
     'JWT_AUTH_COOKIE': None,
     'JWT_AUTH_REFRESH_COOKIE': None,
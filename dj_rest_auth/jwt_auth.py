@@ -7,6 +7,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 
 from .app_settings import api_settings
+from .renderers import FastJSONRendererMixin
 
 
 def set_jwt_access_cookie(response, access_token):
@@ -95,7 +96,7 @@ def get_refresh_view():
     from rest_framework_simplejwt.settings import api_settings as jwt_settings
     from rest_framework_simplejwt.views import TokenRefreshView
 
-    class RefreshViewWithCookieSupport(TokenRefreshView):
+    class RefreshViewWithCookieSupport(FastJSONRendererMixin, TokenRefreshView):
         serializer_class = CookieTokenRefreshSerializer
 
         def finalize_response(self, request, response, *args, **kwargs):
@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import mmap
+import os
+import stat
+import tempfile
+import threading
+from pathlib import Path
+
+from django.contrib.auth import password_validation as django_password_validation
+from django.contrib.auth.password_validation import CommonPasswordValidator
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+
+
+DEFAULT_PASSWORD_LIST_PATH = Path(django_password_validation.__file__).resolve().parent / 'common-passwords.txt.gz'
+
+_mapped_lists = {}
+_mapped_lists_lock = threading.Lock()
+_private_directory = None
+
+
+def compile_password_list(source, destination):
+    """
+    Write the passwords of `source` (plain text or gzipped, one password per
+    line) to `destination` lowercased, deduplicated and sorted bytewise, the
+    format expected by `SharedCommonPasswordValidator`.
+    """
+    try:
+        with gzip.open(source, 'rt', encoding='utf-8') as f:
+            passwords = {line.strip().lower() for line in f}
+    except OSError:
+        with open(source, encoding='utf-8') as f:
+            passwords = {line.strip().lower() for line in f}
+    passwords.discard('')
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(destination)))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b'\n'.join(sorted(password.encode('utf-8') for password in passwords)))
+    # Several workers may compile the list at the same time, the rename
+    # makes sure none of them maps a partially written file.
+    os.replace(tmp_path, destination)
+    return destination
+
+
+def _is_private(path, file_type):
+    """
+    Whether `path` is a `file_type` (not a symbolic link) owned by the
+    current user, that nobody else can write to.
+    """
+    try:
+        path_stat = os.lstat(path)
+    except FileNotFoundError:
+        return False
+    return all((
+        file_type(path_stat.st_mode),
+        path_stat.st_uid == os.getuid(),
+        not path_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH),
+    ))
+
+
+def _get_compiled_lists_directory():
+    """
+    Return a directory only the current user can write to, shared by all
+    its processes. Other users of a shared temporary directory could
+    otherwise plant an empty list. Without such a directory, a new private
+    directory is created for the process.
+    """
+    if hasattr(os, 'getuid'):
+        directory = os.path.join(tempfile.gettempdir(), f'dj-rest-auth-{os.getuid()}')
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+        if _is_private(directory, stat.S_ISDIR):
+            return directory
+    global _private_directory
+    with _mapped_lists_lock:
+        if _private_directory is None:
+            _private_directory = tempfile.mkdtemp(prefix='dj-rest-auth-')
+        return _private_directory
+
+
+def get_compiled_password_list(source=DEFAULT_PASSWORD_LIST_PATH):
+    """
+    Return the path of the compiled version of `source`, compiling it into
+    a private temporary directory the first time it is needed.
+    """
+    source_stat = os.stat(source)
+    fingerprint = hashlib.sha256(
+        f'{os.path.abspath(source)}:{source_stat.st_size}:{source_stat.st_mtime_ns}'.encode(),
+    ).hexdigest()
+    destination = os.path.join(_get_compiled_lists_directory(), f'passwords-{fingerprint[:16]}.txt')
+    if not hasattr(os, 'getuid') or not _is_private(destination, stat.S_ISREG):
+        compile_password_list(source, destination)
+    return destination
+
+
+def _map_password_list(path):
+    with _mapped_lists_lock:
+        if path not in _mapped_lists:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    _mapped_lists[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    _mapped_lists[path] = b''
+        return _mapped_lists[path]
+
+
+def _contains(data, needle):
+    """
+    Binary search for the line `needle` in `data`, the sorted, newline
+    separated bytes of a compiled password list.
+    """
+    lo, hi = 0, len(data)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = data.rfind(b'\n', 0, mid) + 1
+        end = data.find(b'\n', start)
+        if end == -1:
+            end = len(data)
+        line = data[start:end]
+        if line == needle:
+            return True
+        if line < needle:
+            lo = end + 1
+        else:
+            hi = start
+    return False
+
+
+class SharedCommonPasswordValidator(CommonPasswordValidator):
+    """
+    Validate that the password is not a common password.
+
+    Behaves like Django's `CommonPasswordValidator`, but instead of loading
+    the list into a set in every process, the list is compiled once into a
+    sorted file which is memory mapped and binary searched. Every worker on
+    the host shares the same pages through the OS page cache.
+
+    `password_list_path` may point to a list compiled with
+    `compile_password_list`, otherwise Django's list is compiled on first use.
+    """
+
+    def __init__(self, password_list_path=None):
+        self.password_list_path = password_list_path or get_compiled_password_list()
+
+    @property
+    def passwords(self):
+        return _map_password_list(self.password_list_path)
+
+    def validate(self, password, user=None):
+        if _contains(self.passwords, password.lower().strip().encode('utf-8')):
+            raise ValidationError(
+                _('This password is too common.'),
+                code='password_too_common',
+            )
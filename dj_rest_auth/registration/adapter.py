@@ -0,0 +1,290 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from allauth.socialaccount import app_settings as allauth_socialaccount_settings
+from allauth.socialaccount.adapter import DefaultSocialAccountAdapter, get_adapter
+from allauth.socialaccount.models import SocialApp
+from django.contrib.sites.models import Site
+from django.contrib.sites.shortcuts import get_current_site
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from requests.adapters import HTTPAdapter
+
+from dj_rest_auth.app_settings import api_settings
+from dj_rest_auth.registration.metadata import metadata_cache
+from dj_rest_auth.utils import bump_cache_version, get_versioned_cache_key
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter applying a default timeout to requests sent without one.
+    """
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class PooledSession(requests.Session):
+    """
+    Session serving the signing keys and OpenID configurations of the
+    providers from the process-wide `metadata_cache`.
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() == 'GET' and not args and not kwargs.get('params') and metadata_cache.is_cached_url(url):
+            # The document may be refreshed from a background thread, which
+            # then fetches it with its own session.
+            return metadata_cache.get(
+                url, lambda: requests.Session.request(get_pooled_session(), method, url, **kwargs),
+            )
+        return super().request(method, url, *args, **kwargs)
+
+
+_sessions = threading.local()
+
+
+def get_pooled_session():
+    """
+    Return the requests session of the current thread, creating it on first
+    use. Connections to the providers are kept alive in its pool and reused
+    by the next login handled by the thread.
+
+    Cookies are never stored, so nothing leaks from one login to the next.
+    """
+    session = getattr(_sessions, 'session', None)
+    # A session created before the process forked shares its sockets with
+    # the parent process.
+    if session is None or _sessions.pid != os.getpid():
+        timeout = api_settings.SOCIAL_HTTP_TIMEOUT
+        if timeout is None:
+            timeout = allauth_socialaccount_settings.REQUESTS_TIMEOUT
+        adapter = TimeoutHTTPAdapter(
+            pool_connections=api_settings.SOCIAL_HTTP_POOL_SIZE,
+            pool_maxsize=api_settings.SOCIAL_HTTP_POOL_SIZE,
+            timeout=timeout,
+        )
+        session = PooledSession()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions.session = session
+        _sessions.pid = os.getpid()
+    return session
+
+
+_prefetched = threading.local()
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _prefetch_key(url, headers):
+    return url, tuple(sorted((headers or {}).items()))
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Worker threads are kept across logins so their pooled sessions
+        # keep their connections alive.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=api_settings.SOCIAL_HTTP_POOL_SIZE, thread_name_prefix='dj-rest-auth-social',
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _fetch(adapter, url, headers):
+    return adapter.get_requests_session().get(url, headers=headers)
+
+
+@contextmanager
+def prefetched(prefetch_requests):
+    """
+    Send the GET requests `prefetch_requests`, a list of `(url, headers)`
+    tuples, concurrently. Inside the block, the first matching call made
+    through the requests session of the social account adapter gets its
+    response without waiting, so provider calls made one after the other
+    by allauth take about as long as the slowest of them.
+
+    A request which failed is sent again by the matching call. Nothing is
+    prefetched unless the social account adapter uses `PrefetchMixin`.
+    """
+    adapter = get_adapter()
+    if not prefetch_requests or not isinstance(adapter, PrefetchMixin):
+        yield
+        return
+    executor = _get_executor()
+    futures = {
+        _prefetch_key(url, headers): executor.submit(_fetch, adapter, url, headers)
+        for url, headers in prefetch_requests
+    }
+    responses = {}
+    for key, future in futures.items():
+        try:
+            responses[key] = future.result()
+        except requests.RequestException:
+            pass
+    _prefetched.responses = responses
+    try:
+        yield
+    finally:
+        _prefetched.responses = None
+
+
+class PrefetchedSession:
+    """
+    Wrapper of a requests session answering the GET requests which were
+    prefetched from their responses, and sending the others through the
+    wrapped session.
+    """
+
+    def __init__(self, session, responses):
+        self.session = session
+        self.responses = responses
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() == 'GET' and not args and not kwargs.get('params'):
+            response = self.responses.pop(_prefetch_key(url, kwargs.get('headers')), None)
+            if response is not None:
+                return response
+        return self.session.request(method, url, *args, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def _github_prefetch_requests(adapter, token):
+    headers = {'Authorization': f'token {token.token}'}
+    return [(adapter.profile_url, headers), (adapter.emails_url, headers)]
+
+
+def _linkedin_prefetch_requests(adapter, token):
+    provider = adapter.get_provider()
+    headers = {**provider.get_settings().get('HEADERS', {}), 'Authorization': f'Bearer {token.token}'}
+    projection = ','.join(provider.get_profile_fields())
+    return [(adapter.email_url, headers), (f'{adapter.profile_url}?projection=({projection})', headers)]
+
+
+# Providers whose allauth adapter fetches the profile and the e-mail
+# addresses one after the other: the module of the adapter, the methods
+# making the calls, and the requests they send.
+builtin_prefetch_requests = {
+    'github': (
+        'allauth.socialaccount.providers.github.views', ('complete_login', 'get_emails'), _github_prefetch_requests,
+    ),
+    'linkedin_oauth2': (
+        'allauth.socialaccount.providers.linkedin_oauth2.views', ('complete_login', 'get_user_info'),
+        _linkedin_prefetch_requests,
+    ),
+}
+
+
+class PrefetchMixin:
+    """
+    Mixin for allauth social account adapters sending the independent
+    calls a provider adapter makes one after the other, like the profile
+    and e-mail fetches, concurrently before the login completes.
+    """
+
+    def get_prefetch_requests(self, provider_adapter, token):
+        """
+        Return the `(url, headers)` GET requests the allauth adapter of a
+        built-in provider sends one after the other once it has the access
+        token. Adapters overriding the methods making these calls, or
+        missing them, get none.
+        """
+        provider_id = provider_adapter.provider_id
+        if not allauth_socialaccount_settings.QUERY_EMAIL or provider_id not in builtin_prefetch_requests:
+            return []
+        module, methods, build = builtin_prefetch_requests[provider_id]
+        methods = [getattr(type(provider_adapter), method, None) for method in methods]
+        if any(getattr(method, '__module__', None) != module for method in methods):
+            return []
+        return build(provider_adapter, token)
+
+    def get_requests_session(self):
+        session = super().get_requests_session()
+        responses = getattr(_prefetched, 'responses', None)
+        if responses:
+            return PrefetchedSession(session, responses)
+        return session
+
+
+class PooledSessionMixin:
+    """
+    Mixin for allauth social account adapters making the calls to the
+    providers, like the code exchange and the profile fetch, go through
+    pooled keep-alive connections instead of a new session per call.
+    """
+
+    def get_requests_session(self):
+        return get_pooled_session()
+
+
+_apps = {}
+_apps_lock = threading.Lock()
+
+
+def _bump_social_apps_version():
+    bump_cache_version('social_apps', 'all')
+    with _apps_lock:
+        _apps.clear()
+
+
+def clear_social_app_cache(**kwargs):
+    # Bumped right away for this process, and again once the change is
+    # committed: other processes may have cached the apps as they were
+    # before the commit in between.
+    _bump_social_apps_version()
+    transaction.on_commit(_bump_social_apps_version)
+
+
+post_save.connect(clear_social_app_cache, sender=SocialApp, dispatch_uid='dj_rest_auth_social_app_saved')
+post_delete.connect(clear_social_app_cache, sender=SocialApp, dispatch_uid='dj_rest_auth_social_app_deleted')
+m2m_changed.connect(
+    clear_social_app_cache, sender=SocialApp.sites.through, dispatch_uid='dj_rest_auth_social_app_sites',
+)
+post_save.connect(clear_social_app_cache, sender=Site, dispatch_uid='dj_rest_auth_site_saved')
+post_delete.connect(clear_social_app_cache, sender=Site, dispatch_uid='dj_rest_auth_site_deleted')
+
+
+class SocialAppCacheMixin:
+    """
+    Mixin for allauth social account adapters keeping the social apps of
+    every provider and site in memory, instead of querying them on every
+    login. The apps are tagged with a version kept in Django's cache,
+    bumped when a social app or a site is saved or deleted, so every
+    process sharing the cache reads them again after a change.
+    """
+
+    def list_apps(self, request, provider=None, client_id=None):
+        key = (get_current_site(request).pk if request else None, provider, client_id)
+        # Read before the apps, so apps read during a change are tagged with
+        # the version it replaces.
+        version = get_versioned_cache_key('social_apps', 'all')
+        cached = _apps.get(key)
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+        apps = super().list_apps(request, provider=provider, client_id=client_id)
+        with _apps_lock:
+            _apps[key] = (version, apps)
+        return list(apps)
+
+
+class SocialAccountAdapter(SocialAppCacheMixin, PrefetchMixin, PooledSessionMixin, DefaultSocialAccountAdapter):
+    pass
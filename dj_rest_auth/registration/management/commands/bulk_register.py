@@ -0,0 +1,71 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from dj_rest_auth.registration.serializers import BulkRegisterSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Registers the users listed in a JSON file. The file must contain a list '
+        'of objects with the same fields as the register endpoint.'
+    )
+    stealth_options = ('stdin',)
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON file with the users to register, "-" for stdin.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of users inserted per transaction (default: 1000).',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of threads used to hash passwords (default: based on the CPU count).',
+        )
+
+    def load_rows(self, path):
+        try:
+            if path == '-':
+                rows = json.load(self.stdin)
+            else:
+                with open(path, encoding='utf8') as f:
+                    rows = json.load(f)
+        except (OSError, ValueError) as ex:
+            raise CommandError(f'Unable to read {path}: {ex}')
+        if not isinstance(rows, list):
+            raise CommandError('The file must contain a list of users.')
+        return rows
+
+    def handle(self, *args, **options):
+        self.stdin = options.get('stdin', sys.stdin)
+        rows = self.load_rows(options['path'])
+        batch_size = options['batch_size']
+
+        started = time.monotonic()
+        created = 0
+        failed = 0
+        for offset in range(0, len(rows), batch_size):
+            serializer = BulkRegisterSerializer(
+                data={'users': rows[offset:offset + batch_size]},
+                hash_workers=options['workers'],
+            )
+            if not serializer.is_valid():
+                raise CommandError(json.dumps(serializer.errors))
+            try:
+                serializer.save(None)
+            except ValidationError as ex:
+                raise CommandError(json.dumps(ex.detail))
+            for index, result in enumerate(serializer.results, start=offset):
+                if 'errors' in result:
+                    failed += 1
+                    self.stderr.write(f'Row {index}: {json.dumps(result["errors"])}')
+                else:
+                    created += 1
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Registered {created} users in {elapsed:.2f}s, {failed} rows rejected.'),
+        )
@@ -0,0 +1,167 @@
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from dj_rest_auth.app_settings import api_settings
+
+
+WELL_KNOWN_OPENID_CONFIGURATION = '/.well-known/openid-configuration'
+
+
+class CachedDocument:
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self.encoding = response.encoding
+        self.content = response.content
+        self.fetched_at = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+    def to_response(self, url):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response._content = self.content
+        response.url = url
+        return response
+
+
+class ProviderMetadataCache:
+    """
+    Process-wide cache of the documents the providers publish for the
+    verification of id_tokens: their signing keys and OpenID configuration.
+
+    A document is fetched once and served from memory until it expires.
+    Once it is older than `refresh_ratio` of its timeout it is refreshed in
+    a background thread while the cached copy keeps being served. When a
+    fetch is needed, concurrent requests for the same document wait for a
+    single fetch instead of all calling the provider.
+    """
+
+    refresh_ratio = 0.75
+    # Minimum age of a document before it may be refetched because a login
+    # referenced a key it does not contain, so forged key ids can not be
+    # used to hammer the provider.
+    min_refetch_interval = 60
+
+    def __init__(self):
+        self._documents = {}
+        self._urls = set()
+        self._locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._served = threading.local()
+
+    @property
+    def timeout(self):
+        return api_settings.SOCIAL_METADATA_CACHE_TIMEOUT
+
+    def is_cached_url(self, url):
+        if not self.timeout:
+            return False
+        if url in self._urls or url in api_settings.SOCIAL_METADATA_URLS:
+            return True
+        return url.endswith(WELL_KNOWN_OPENID_CONFIGURATION)
+
+    def get(self, url, fetch):
+        """
+        Return the response for `url`, calling `fetch` to retrieve it from
+        the provider when there is no usable cached copy.
+        """
+        document = self._documents.get(url)
+        if document is not None and document.age() < self.timeout:
+            if document.age() >= self.timeout * self.refresh_ratio:
+                self._refresh_in_background(url, fetch)
+            self._mark_served(url)
+            return document.to_response(url)
+
+        with self._get_lock(url):
+            # Another thread may have fetched the document while this one
+            # was waiting for the lock.
+            document = self._documents.get(url)
+            if document is not None and document.age() < self.timeout:
+                self._mark_served(url)
+                return document.to_response(url)
+            response = fetch()
+            self._store(url, response)
+            return response
+
+    def refetch_served(self):
+        """
+        Expire the documents served from the cache to the current thread
+        since the last call, so they are fetched again on their next use.
+        Called when a login failed to verify with them, most likely because
+        the provider rotated its keys.
+
+        Returns whether any document was expired.
+        """
+        urls = getattr(self._served, 'urls', set())
+        self._served.urls = set()
+        expired = False
+        with self._lock:
+            for url in urls:
+                document = self._documents.get(url)
+                if document is not None and document.age() >= self.min_refetch_interval:
+                    del self._documents[url]
+                    expired = True
+        return expired
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self._urls.clear()
+        self._served.urls = set()
+
+    def _get_lock(self, url):
+        with self._lock:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def _mark_served(self, url):
+        if not hasattr(self._served, 'urls'):
+            self._served.urls = set()
+        self._served.urls.add(url)
+
+    def _store(self, url, response):
+        if response.status_code != 200:
+            return
+        document = CachedDocument(response)
+        with self._lock:
+            self._documents[url] = document
+        if url.endswith(WELL_KNOWN_OPENID_CONFIGURATION):
+            # The keys of OpenID Connect providers are listed in their
+            # configuration, cache them as well.
+            try:
+                jwks_uri = response.json().get('jwks_uri')
+            except ValueError:
+                jwks_uri = None
+            if jwks_uri:
+                with self._lock:
+                    self._urls.add(jwks_uri)
+
+    def _refresh_in_background(self, url, fetch):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def refresh():
+            try:
+                self._store(url, fetch())
+            except requests.RequestException:
+                # The cached copy is served until it expires, the next
+                # request then fetches the document itself.
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+metadata_cache = ProviderMetadataCache()
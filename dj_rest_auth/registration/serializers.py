@@ -1,7 +1,13 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from allauth.socialaccount.providers.oauth2.client import OAuth2Error
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ValidationError as DjangoValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Lower
 from django.http import HttpRequest, HttpResponseBadRequest
 from django.urls.exceptions import NoReverseMatch
 from django.utils.translation import gettext_lazy as _
@@ -9,10 +15,16 @@ from requests.exceptions import HTTPError
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 
+from dj_rest_auth.app_settings import api_settings
+from dj_rest_auth.registration.adapter import prefetched
+from dj_rest_auth.registration.metadata import metadata_cache
+from dj_rest_auth.signals import password_validated, social_login_completed
+from dj_rest_auth.utils import ephemeral_session
+
 try:
     from allauth.account import app_settings as allauth_account_settings
     from allauth.account.adapter import get_adapter
-    from allauth.account.utils import setup_user_email
+    from allauth.account.utils import setup_user_email, user_email, user_field, user_username
     from allauth.socialaccount.helpers import complete_social_login
     from allauth.socialaccount.models import EmailAddress, SocialAccount
     from allauth.socialaccount.providers.base import AuthProcess
@@ -49,10 +61,17 @@ class SocialAccountSerializer(serializers.ModelSerializer):
         )
 
 
-class SocialLoginSerializer(serializers.Serializer):
-    access_token = serializers.CharField(required=False, allow_blank=True)
-    code = serializers.CharField(required=False, allow_blank=True)
-    id_token = serializers.CharField(required=False, allow_blank=True)
+class BaseSocialLoginSerializer(serializers.Serializer):
+    """
+    Logs a user in with the credentials of a social provider.
+
+    Subclasses turn their fields into a `SocialToken` in `get_token`. Getting
+    the adapter of the view, completing the login with the provider and
+    signing new users up are shared by all providers.
+    """
+    # Errors raised by the adapter while talking to the provider, turned
+    # into validation errors by `provider_error`.
+    provider_error_classes = (HTTPError,)
 
     def _get_request(self):
         request = self.context.get('request')
@@ -60,6 +79,29 @@ class SocialLoginSerializer(serializers.Serializer):
             request = request._request
         return request
 
+    def get_adapter(self):
+        view = self.context.get('view')
+        if not view:
+            raise serializers.ValidationError(
+                _('View is not defined, pass it as a context variable'),
+            )
+
+        adapter_class = getattr(view, 'adapter_class', None)
+        if not adapter_class:
+            raise serializers.ValidationError(_('Define adapter_class in view'))
+
+        return adapter_class(self._get_request())
+
+    def get_token(self, adapter, app, attrs):
+        """
+        :param adapter: allauth.socialaccount Adapter subclass.
+        :param app: `allauth.socialaccount.SocialApp` instance
+        :param attrs: The attributes of the serializer.
+        :returns: A tuple of the `allauth.socialaccount.SocialToken` instance
+            and the provider's response passed to the adapter.
+        """
+        raise NotImplementedError('`get_token()` must be implemented.')
+
     def get_social_login(self, adapter, app, token, response):
         """
         :param adapter: allauth.socialaccount Adapter subclass.
@@ -71,10 +113,124 @@ class SocialLoginSerializer(serializers.Serializer):
             `allauth.socialaccount.SocialLoginView` instance
         """
         request = self._get_request()
-        social_login = adapter.complete_login(request, app, token, response=response)
+        try:
+            social_login = adapter.complete_login(request, app, token, response=response)
+        except OAuth2Error:
+            # The id_token may be signed with a key published after the
+            # cached keys of the provider were fetched.
+            if not metadata_cache.refetch_served():
+                raise
+            social_login = adapter.complete_login(request, app, token, response=response)
         social_login.token = token
         return social_login
 
+    def provider_error(self, exc):
+        return serializers.ValidationError(_('Incorrect value'))
+
+    def complete_login(self, adapter, app, token, response):
+        request = self._get_request()
+        view = self.context['view']
+        get_prefetch_requests = getattr(view, 'get_prefetch_requests', None)
+        prefetch_requests = get_prefetch_requests(adapter, token) if get_prefetch_requests else []
+
+        start = time.perf_counter()
+        try:
+            with prefetched(prefetch_requests):
+                login = self.get_social_login(adapter, app, token, response)
+            ret = complete_social_login(request, login)
+        except self.provider_error_classes as ex:
+            raise self.provider_error(ex) from ex
+        social_login_completed.send(
+            sender=self.__class__, provider=adapter.provider_id, duration=time.perf_counter() - start,
+        )
+
+        if isinstance(ret, HttpResponseBadRequest):
+            raise serializers.ValidationError(ret.content)
+        return login
+
+    def validate(self, attrs):
+        view = self.context.get('view')
+        if hasattr(view, 'use_session_login'):
+            session_login = view.use_session_login()
+        else:
+            session_login = api_settings.SESSION_LOGIN
+        if api_settings.STATELESS_SOCIAL_LOGIN and not session_login:
+            # allauth logs the user into the session and keeps the state of
+            # the login in it, none of which is needed to issue a token.
+            with ephemeral_session(self._get_request()):
+                return self.validate_login(attrs)
+        return self.validate_login(attrs)
+
+    def validate_login(self, attrs):
+        adapter = self.get_adapter()
+        app = adapter.get_provider().app
+        token, response = self.get_token(adapter, app, attrs)
+        token.app = app
+
+        login = self.complete_login(adapter, app, token, response)
+        if not login.is_existing:
+            self.signup(login, attrs)
+
+        attrs['user'] = login.account.user
+
+        return attrs
+
+    def signup(self, login, attrs):
+        request = self._get_request()
+        # We have an account already signed up in a different flow
+        # with the same email address: raise an exception.
+        # This needs to be handled in the frontend. We can not just
+        # link up the accounts due to security constraints
+        if allauth_account_settings.UNIQUE_EMAIL:
+            # Do we have an account already with this email address?
+            if self.email_is_registered(login.user.email):
+                raise serializers.ValidationError(
+                    _('User is already registered with this e-mail address.'),
+                )
+
+        # complete_social_login already looked up the social account and
+        # the users of its e-mail addresses, a user registering them in
+        # the meantime makes the save fail.
+        try:
+            with transaction.atomic():
+                login.save(request, connect=True)
+        except IntegrityError as ex:
+            raise serializers.ValidationError(
+                _('User is already registered with this e-mail address.'),
+            ) from ex
+        self.post_signup(login, attrs)
+
+    def email_is_registered(self, email):
+        """
+        Return whether a user is registered with `email`, as the e-mail of
+        their account or as one of their verified e-mail addresses. Both are
+        looked up with a single query.
+        """
+        email_field = allauth_account_settings.USER_MODEL_EMAIL_FIELD
+        if not email or not email_field:
+            return False
+        addresses = EmailAddress.objects.filter(user=OuterRef('pk'), email=email.lower(), verified=True)
+        return get_user_model()._default_manager.filter(
+            Q(**{email_field: email}) | Q(Exists(addresses)),
+        ).exists()
+
+    def post_signup(self, login, attrs):
+        """
+        Inject behavior when the user signs up with a social account.
+
+        :param login: The social login instance being registered.
+        :type login: allauth.socialaccount.models.SocialLogin
+        :param attrs: The attributes of the serializer.
+        :type attrs: dict
+        """
+        pass
+
+
+class SocialLoginSerializer(BaseSocialLoginSerializer):
+    access_token = serializers.CharField(required=False, allow_blank=True)
+    code = serializers.CharField(required=False, allow_blank=True)
+    id_token = serializers.CharField(required=False, allow_blank=True)
+
     def set_callback_url(self, view, adapter_class):
         # first set url from view
         self.callback_url = getattr(view, 'callback_url', None)
@@ -90,22 +246,10 @@ class SocialLoginSerializer(serializers.Serializer):
                     _('Define callback_url in view'),
                 )
 
-    def validate(self, attrs):
+    def get_token(self, adapter, app, attrs):
         view = self.context.get('view')
         request = self._get_request()
 
-        if not view:
-            raise serializers.ValidationError(
-                _('View is not defined, pass it as a context variable'),
-            )
-
-        adapter_class = getattr(view, 'adapter_class', None)
-        if not adapter_class:
-            raise serializers.ValidationError(_('Define adapter_class in view'))
-
-        adapter = adapter_class(request)
-        app = adapter.get_provider().app
-
         # More info on code vs access_token
         # http://stackoverflow.com/questions/8666316/facebook-oauth-2-0-code-and-token
 
@@ -122,7 +266,7 @@ class SocialLoginSerializer(serializers.Serializer):
 
         # Case 2: We received the authorization code
         elif code:
-            self.set_callback_url(view=view, adapter_class=adapter_class)
+            self.set_callback_url(view=view, adapter_class=adapter.__class__)
             self.client_class = getattr(view, 'client_class', None)
 
             if not self.client_class:
@@ -160,58 +304,9 @@ class SocialLoginSerializer(serializers.Serializer):
             )
 
         social_token = adapter.parse_token(tokens_to_parse)
-        social_token.app = app
-
-        try:
-            if adapter.provider_id == 'google' and not code:
-                login = self.get_social_login(adapter, app, social_token, response={'id_token': id_token})
-            else:
-                login = self.get_social_login(adapter, app, social_token, token)
-            ret = complete_social_login(request, login)
-        except HTTPError:
-            raise serializers.ValidationError(_('Incorrect value'))
-
-        if isinstance(ret, HttpResponseBadRequest):
-            raise serializers.ValidationError(ret.content)
-
-        if not login.is_existing:
-            # We have an account already signed up in a different flow
-            # with the same email address: raise an exception.
-            # This needs to be handled in the frontend. We can not just
-            # link up the accounts due to security constraints
-            if allauth_account_settings.UNIQUE_EMAIL:
-                # Do we have an account already with this email address?
-                account_exists = get_user_model().objects.filter(
-                    email=login.user.email,
-                ).exists()
-                if account_exists:
-                    raise serializers.ValidationError(
-                        _('User is already registered with this e-mail address.'),
-                    )
-
-            login.lookup()
-            try:
-                login.save(request, connect=True)
-            except IntegrityError as ex:
-                raise serializers.ValidationError(
-                    _('User is already registered with this e-mail address.'),
-                ) from ex
-            self.post_signup(login, attrs)
-
-        attrs['user'] = login.account.user
-
-        return attrs
-
-    def post_signup(self, login, attrs):
-        """
-        Inject behavior when the user signs up with a social account.
-
-        :param login: The social login instance being registered.
-        :type login: allauth.socialaccount.models.SocialLogin
-        :param attrs: The attributes of the serializer.
-        :type attrs: dict
-        """
-        pass
+        if adapter.provider_id == 'google' and not code:
+            return social_token, {'id_token': id_token}
+        return social_token, token
 
 
 class SocialConnectMixin:
@@ -230,6 +325,85 @@ class SocialConnectSerializer(SocialConnectMixin, SocialLoginSerializer):
     pass
 
 
+class UniqueRegistrationValidator:
+    """
+    Checks that the username and e-mail address of a registration are still
+    available. Both are looked up in a single query, the UNION of an
+    indexed lookup per field, instead of one query per field.
+    """
+    requires_context = True
+
+    def get_conflicts(self, username=None, email=None):
+        """
+        Return the names of the fields, `username` and/or `email`, whose value
+        is already taken.
+        """
+        username_field = allauth_account_settings.USER_MODEL_USERNAME_FIELD
+        lookups = []
+        if username and username_field:
+            # The same lookups as allauth's own check.
+            if allauth_account_settings.PRESERVE_USERNAME_CASING:
+                users = get_user_model()._default_manager.filter(**{f'{username_field}__iexact': username})
+            else:
+                users = get_user_model()._default_manager.filter(**{username_field: username.lower()})
+            lookups.append(users.annotate(taken=Value('username')))
+        if email and allauth_account_settings.UNIQUE_EMAIL:
+            lookups.append(
+                EmailAddress.objects.filter(email=email.lower(), verified=True).annotate(taken=Value('email')),
+            )
+        if not lookups:
+            return set()
+
+        # The default ordering of the models isn't allowed in the parts of
+        # a UNION on SQLite and Oracle.
+        lookups = [lookup.order_by().values_list('taken', flat=True) for lookup in lookups]
+        return set(lookups[0].union(*lookups[1:]))
+
+    def get_batch_conflicts(self, usernames=(), emails=()):
+        """
+        Return the taken values among `usernames` and `emails`, as a set of
+        `(field, value)` pairs with lowercase values. All of them are looked
+        up in a single query.
+        """
+        username_field = allauth_account_settings.USER_MODEL_USERNAME_FIELD
+        usernames = {username.lower() for username in usernames if username}
+        emails = {email.lower() for email in emails if email}
+        lookups = []
+        if usernames and username_field:
+            users = get_user_model()._default_manager
+            if allauth_account_settings.PRESERVE_USERNAME_CASING:
+                users = users.annotate(value=Lower(username_field)).filter(value__in=usernames)
+            else:
+                users = users.filter(**{f'{username_field}__in': usernames}).annotate(value=F(username_field))
+            lookups.append(users.annotate(taken=Value('username')))
+        if emails and allauth_account_settings.UNIQUE_EMAIL:
+            lookups.append(
+                EmailAddress.objects.filter(email__in=emails, verified=True)
+                .annotate(taken=Value('email'), value=F('email')),
+            )
+        if not lookups:
+            return set()
+
+        lookups = [lookup.order_by().values_list('taken', 'value') for lookup in lookups]
+        return {(field, value.lower()) for field, value in lookups[0].union(*lookups[1:])}
+
+    def get_errors(self, conflicts):
+        errors = {}
+        if 'username' in conflicts:
+            errors['username'] = [get_adapter().error_messages['username_taken']]
+        if 'email' in conflicts:
+            errors['email'] = [_('User is already registered with this e-mail address.')]
+        return errors
+
+    def __call__(self, attrs, serializer):
+        if serializer.context.get('defer_unique_check'):
+            # Checked for the whole batch at once by BulkRegisterSerializer.
+            return
+        conflicts = self.get_conflicts(attrs.get('username'), attrs.get('email'))
+        if conflicts:
+            raise serializers.ValidationError(self.get_errors(conflicts))
+
+
 class RegisterSerializer(serializers.Serializer):
     username = serializers.CharField(
         max_length=get_username_max_length(),
@@ -240,21 +414,60 @@ class RegisterSerializer(serializers.Serializer):
     password1 = serializers.CharField(write_only=True)
     password2 = serializers.CharField(write_only=True)
 
+    unique_validator_class = UniqueRegistrationValidator
+
+    def get_validators(self):
+        # Availability of the username and e-mail address is checked
+        # here with one query rather than in the field validators.
+        return [*super().get_validators(), self.unique_validator_class()]
+
     def validate_username(self, username):
-        username = get_adapter().clean_username(username)
+        username = get_adapter().clean_username(username, shallow=True)
         return username
 
     def validate_email(self, email):
         email = get_adapter().clean_email(email)
-        if allauth_account_settings.UNIQUE_EMAIL:
-            if email and EmailAddress.objects.is_verified(email):
-                raise serializers.ValidationError(
-                    _('User is already registered with this e-mail address.'),
-                )
         return email
 
+    # User attributes the password validators compare the password against,
+    # see UserAttributeSimilarityValidator.
+    password_user_attributes = ('username', 'first_name', 'last_name', 'email')
+
+    _password_validation_user = None
+
+    def get_password_validation_user(self):
+        """
+        Return an unsaved user carrying the submitted username and e-mail
+        address, so the password validators can check the password against
+        them while the serializer is being validated.
+        """
+        user = get_adapter().new_user(self.context.get('request'))
+        username = self.initial_data.get('username')
+        email = self.initial_data.get('email')
+        user_username(user, username if isinstance(username, str) else '')
+        user_email(user, email if isinstance(email, str) else '')
+        return user
+
+    def clean_password(self, password, user):
+        started = time.perf_counter()
+        password = get_adapter().clean_password(password, user=user)
+        password_validated.send(
+            sender=self.__class__, user=user, duration=time.perf_counter() - started,
+        )
+        return password
+
+    def _password_user_changed(self, user):
+        validated_user = self._password_validation_user
+        if validated_user is None:
+            return True
+        return any(
+            user_field(validated_user, attribute) != user_field(user, attribute)
+            for attribute in self.password_user_attributes
+        )
+
     def validate_password1(self, password):
-        return get_adapter().clean_password(password)
+        self._password_validation_user = self.get_password_validation_user()
+        return self.clean_password(password, self._password_validation_user)
 
     def validate(self, data):
         if data['password1'] != data['password2']:
@@ -276,19 +489,184 @@ class RegisterSerializer(serializers.Serializer):
         user = adapter.new_user(request)
         self.cleaned_data = self.get_cleaned_data()
         user = adapter.save_user(request, user, self, commit=False)
-        if "password1" in self.cleaned_data:
+        # The password has already been validated against the submitted
+        # username and e-mail, only validate it again when the user built
+        # by the adapter differs from that.
+        if "password1" in self.cleaned_data and self._password_user_changed(user):
             try:
-                adapter.clean_password(self.cleaned_data['password1'], user=user)
+                self.clean_password(self.cleaned_data['password1'], user)
             except DjangoValidationError as exc:
                 raise serializers.ValidationError(
                     detail=serializers.as_serializer_error(exc)
                 )
-        user.save()
-        self.custom_signup(request, user)
-        setup_user_email(request, user, [])
+        try:
+            with transaction.atomic():
+                user.save()
+                self.custom_signup(request, user)
+                setup_user_email(request, user, [])
+        except IntegrityError as ex:
+            # Another registration took the username or e-mail address
+            # after validation, report it like the validator would have.
+            validator = self.unique_validator_class()
+            conflicts = validator.get_conflicts(
+                self.cleaned_data.get('username'), self.cleaned_data.get('email'),
+            )
+            raise serializers.ValidationError(
+                validator.get_errors(conflicts) or _('User is already registered with this e-mail address.'),
+            ) from ex
         return user
 
 
+class BulkRegisterSerializer(serializers.Serializer):
+    """
+    Registers many users at once.
+
+    Every row is validated with `row_serializer_class`, so the same rules
+    as a single registration apply. The availability of the usernames and
+    e-mail addresses is checked for the whole batch in one query. Rows
+    failing validation are reported back instead of failing the whole
+    batch. Passwords of the valid rows are hashed in parallel and the users
+    and their e-mail addresses are inserted with `bulk_create`.
+    """
+    users = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    row_serializer_class = RegisterSerializer
+    hash_workers = None
+
+    def __init__(self, *args, **kwargs):
+        self.hash_workers = kwargs.pop('hash_workers', self.hash_workers)
+        super().__init__(*args, **kwargs)
+
+    def validate_users(self, rows):
+        self.rows = []
+        self.row_errors = {}
+        seen_usernames = set()
+        seen_emails = set()
+        context = {**self.context, 'defer_unique_check': True}
+
+        for index, row in enumerate(rows):
+            row_serializer = self.row_serializer_class(data=row, context=context)
+            if not row_serializer.is_valid():
+                self.row_errors[index] = row_serializer.errors
+                continue
+
+            username = (row_serializer.validated_data.get('username') or '').lower()
+            email = (row_serializer.validated_data.get('email') or '').lower()
+            if username and username in seen_usernames:
+                self.row_errors[index] = {'username': [_('Duplicated in this batch.')]}
+                continue
+            if email and allauth_account_settings.UNIQUE_EMAIL and email in seen_emails:
+                self.row_errors[index] = {'email': [_('Duplicated in this batch.')]}
+                continue
+            seen_usernames.add(username)
+            seen_emails.add(email)
+            self.rows.append((index, row_serializer))
+
+        self.reject_taken_rows()
+        return rows
+
+    def reject_taken_rows(self):
+        """
+        Move the rows whose username or e-mail address is already taken to
+        the row errors. Return whether any row was rejected.
+        """
+        validator_class = self.row_serializer_class.unique_validator_class
+        if not validator_class or not self.rows:
+            return False
+        validator = validator_class()
+        conflicts = validator.get_batch_conflicts(
+            [row.validated_data.get('username') for _index, row in self.rows],
+            [row.validated_data.get('email') for _index, row in self.rows],
+        )
+        if not conflicts:
+            return False
+
+        rows = []
+        for index, row_serializer in self.rows:
+            taken = {
+                field for field in ('username', 'email')
+                if (field, (row_serializer.validated_data.get(field) or '').lower()) in conflicts
+            }
+            if taken:
+                self.row_errors[index] = validator.get_errors(taken)
+            else:
+                rows.append((index, row_serializer))
+        rejected = len(rows) < len(self.rows)
+        self.rows = rows
+        return rejected
+
+    def hash_passwords(self, passwords):
+        """
+        Hash `passwords` concurrently. The hashers shipped with Django release
+        the GIL while hashing, so a thread pool is enough to use every core.
+        """
+        with ThreadPoolExecutor(max_workers=self.hash_workers) as executor:
+            return list(executor.map(lambda password: make_password(password or None), passwords))
+
+    def _build_user(self, request, adapter, row_serializer):
+        cleaned_data = row_serializer.get_cleaned_data()
+        password = cleaned_data.pop('password1', None)
+        row_serializer.cleaned_data = cleaned_data
+        user = adapter.new_user(request)
+        # Without `password1` allauth only sets an unusable password, the
+        # real hash is filled in once all rows have been hashed.
+        user = adapter.save_user(request, user, row_serializer, commit=False)
+        return user, password
+
+    def _insert(self, request, rows, users):
+        UserModel = get_user_model()
+        with transaction.atomic():
+            UserModel._default_manager.bulk_create(users)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                username_field = UserModel.USERNAME_FIELD
+                pks = dict(
+                    UserModel._default_manager.filter(**{
+                        f'{username_field}__in': [getattr(user, username_field) for user in users],
+                    }).values_list(username_field, 'pk'),
+                )
+                for user in users:
+                    user.pk = pks[getattr(user, username_field)]
+            EmailAddress.objects.bulk_create([
+                EmailAddress(user=user, email=user.email.lower(), primary=True, verified=False)
+                for user in users if getattr(user, 'email', None)
+            ])
+            for (_index, row_serializer), user in zip(rows, users):
+                row_serializer.custom_signup(request, user)
+
+    def save(self, request):
+        adapter = get_adapter()
+
+        built = [self._build_user(request, adapter, row) for _index, row in self.rows]
+        hashes = self.hash_passwords([password for _user, password in built])
+        users = {}
+        for (_index, row_serializer), (user, _password), password_hash in zip(self.rows, built, hashes):
+            user.password = password_hash
+            users[row_serializer] = user
+
+        while True:
+            try:
+                self._insert(request, self.rows, [users[row] for _index, row in self.rows])
+                break
+            except IntegrityError as ex:
+                # Users registered since the validation: their rows are
+                # rejected and the others inserted again. A conflict which
+                # can't be traced back to a row fails the batch.
+                for user in users.values():
+                    user.pk = None
+                    user._state.adding = True
+                if not self.reject_taken_rows():
+                    raise serializers.ValidationError(
+                        _('A user in this batch has been registered concurrently, please retry.'),
+                    ) from ex
+
+        self.results = [None] * len(self.validated_data['users'])
+        for index, errors in self.row_errors.items():
+            self.results[index] = {'errors': errors}
+        for index, row_serializer in self.rows:
+            self.results[index] = {'pk': users[row_serializer].pk}
+        return [users[row] for _index, row in self.rows]
+
+
 class VerifyEmailSerializer(serializers.Serializer):
     key = serializers.CharField(write_only=True)
 
@@ -1,3 +1,5 @@
+import hashlib
+
 from allauth.account import app_settings as allauth_account_settings
 from allauth.account.adapter import get_adapter
 from allauth.account.utils import complete_signup
@@ -6,23 +8,34 @@ from allauth.account.models import EmailAddress
 from allauth.socialaccount import signals
 from allauth.socialaccount.adapter import get_adapter as get_social_adapter
 from allauth.socialaccount.models import SocialAccount
+from django.core import signing
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Subquery
+from django.db.models.signals import post_delete, post_save
 from django.utils.decorators import method_decorator
-from django.utils.translation import gettext_lazy as _
+from django.utils.http import parse_etags
+from django.utils.translation import gettext_noop
 from django.views.decorators.debug import sensitive_post_parameters
 from rest_framework import status
 from rest_framework.exceptions import MethodNotAllowed, NotFound
 from rest_framework.generics import CreateAPIView, GenericAPIView, ListAPIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings as drf_settings
 from rest_framework.views import APIView
 
 from dj_rest_auth.app_settings import api_settings
 from dj_rest_auth.models import TokenModel
+from dj_rest_auth.registration.adapter import PrefetchMixin
 from dj_rest_auth.registration.serializers import (
-    SocialAccountSerializer, SocialConnectSerializer, SocialLoginSerializer,
-    VerifyEmailSerializer, ResendEmailVerificationSerializer
+    BulkRegisterSerializer, SocialAccountSerializer, SocialConnectSerializer,
+    SocialLoginSerializer, VerifyEmailSerializer, ResendEmailVerificationSerializer
 )
-from dj_rest_auth.utils import jwt_encode
+from dj_rest_auth.renderers import FastJSONRendererMixin
+from dj_rest_auth.serializers import get_auth_response_data
+from dj_rest_auth.utils import bump_cache_version, get_detail, get_etag, get_versioned_cache_key, jwt_encode
 from dj_rest_auth.views import LoginView
 
 
@@ -31,7 +44,7 @@ sensitive_post_parameters_m = method_decorator(
 )
 
 
-class RegisterView(CreateAPIView):
+class RegisterView(FastJSONRendererMixin, CreateAPIView):
     """
     Registers a new user.
 
@@ -49,7 +62,7 @@ class RegisterView(CreateAPIView):
     def get_response_data(self, user):
         if allauth_account_settings.EMAIL_VERIFICATION == \
                 allauth_account_settings.EmailVerificationMethod.MANDATORY:
-            return {'detail': _('Verification e-mail sent.')}
+            return get_detail(gettext_noop('Verification e-mail sent.'))
 
         if api_settings.USE_JWT:
             data = {
@@ -57,9 +70,10 @@ class RegisterView(CreateAPIView):
                 'access': self.access_token,
                 'refresh': self.refresh_token,
             }
-            return api_settings.JWT_SERIALIZER(data, context=self.get_serializer_context()).data
+            return get_auth_response_data(api_settings.JWT_SERIALIZER, data, self.get_serializer_context())
         elif self.token_model:
-            return api_settings.TOKEN_SERIALIZER(user.auth_token, context=self.get_serializer_context()).data
+            token = getattr(self, 'token', None) or user.auth_token
+            return get_auth_response_data(api_settings.TOKEN_SERIALIZER, token, self.get_serializer_context())
         return None
 
     def create(self, request, *args, **kwargs):
@@ -87,7 +101,7 @@ class RegisterView(CreateAPIView):
             if api_settings.USE_JWT:
                 self.access_token, self.refresh_token = jwt_encode(user)
             elif self.token_model:
-                api_settings.TOKEN_CREATOR(self.token_model, user, serializer)
+                self.token = api_settings.TOKEN_CREATOR(self.token_model, user, serializer)
 
         complete_signup(
             self.request._request, user,
@@ -97,7 +111,32 @@ class RegisterView(CreateAPIView):
         return user
 
 
-class VerifyEmailView(APIView, ConfirmEmailView):
+class BulkRegisterView(FastJSONRendererMixin, GenericAPIView):
+    """
+    Registers many users in one request. Restricted to staff users.
+
+    Accepts the following POST parameter: users, a list of objects with the
+    same fields as the register endpoint.
+    Returns one result per submitted user, in order: either the pk of the
+    new user or the validation errors of that row. No verification e-mails
+    are sent.
+    """
+    serializer_class = BulkRegisterSerializer
+    permission_classes = (IsAdminUser,)
+    throttle_scope = 'dj_rest_auth'
+
+    @method_decorator(sensitive_post_parameters('users'))
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(self.request)
+        return Response({'results': serializer.results}, status=status.HTTP_200_OK)
+
+
+class VerifyEmailView(FastJSONRendererMixin, APIView, ConfirmEmailView):
     """
     Verifies the email associated with the provided key.
 
@@ -112,34 +151,109 @@ class VerifyEmailView(APIView, ConfirmEmailView):
     def get(self, *args, **kwargs):
         raise MethodNotAllowed('GET')
 
+    def get_email_address_pk(self, key):
+        """
+        Return the pk of the e-mail address a HMAC key was issued for. Only
+        the signature and the age of the key are checked, no query is made.
+        """
+        max_age = 60 * 60 * 24 * allauth_account_settings.EMAIL_CONFIRMATION_EXPIRE_DAYS
+        try:
+            return signing.loads(key, max_age=max_age, salt=allauth_account_settings.SALT)
+        except signing.BadSignature:
+            raise NotFound
+
+    def confirm_stateless(self, key):
+        """
+        Mark the address verified with a single conditional UPDATE. Replayed
+        or concurrent confirmations of the same key update no row, check
+        that the address is verified and stop there, only the first one
+        loads the address to run allauth's confirmation side effects
+        (primary address, signals, messages).
+        """
+        pk = self.get_email_address_pk(key)
+        if allauth_account_settings.UNIQUE_EMAIL:
+            # A separate SELECT on the index of the addresses: MySQL can't
+            # UPDATE a table with a subquery on the same table.
+            duplicates = EmailAddress.objects.filter(
+                email=Subquery(EmailAddress.objects.filter(pk=pk).values('email')[:1]), verified=True,
+            ).exclude(pk=pk)
+            if duplicates.exists():
+                raise NotFound
+        try:
+            with transaction.atomic():
+                updated = EmailAddress.objects.filter(pk=pk, verified=False).update(verified=True)
+        except IntegrityError:
+            # The same address of another user was verified in between.
+            raise NotFound
+        if not updated:
+            if EmailAddress.objects.filter(pk=pk, verified=True).exists():
+                return
+            raise NotFound
+        email_address = EmailAddress.objects.select_related('user').get(pk=pk)
+        get_adapter(self.request).confirm_email(self.request, email_address)
+
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.kwargs['key'] = serializer.validated_data['key']
-        confirmation = self.get_object()
-        confirmation.confirm(self.request)
-        return Response({'detail': _('ok')}, status=status.HTTP_200_OK)
+        key = serializer.validated_data['key']
+        if api_settings.STATELESS_EMAIL_VERIFICATION and allauth_account_settings.EMAIL_CONFIRMATION_HMAC:
+            self.confirm_stateless(key)
+        else:
+            self.kwargs['key'] = key
+            confirmation = self.get_object()
+            confirmation.confirm(self.request)
+        return Response(get_detail(gettext_noop('ok')), status=status.HTTP_200_OK)
 
 
-class ResendEmailVerificationView(CreateAPIView):
+class ResendEmailVerificationView(FastJSONRendererMixin, CreateAPIView):
     """
     Resends another email to an unverified email.
 
     Accepts the following POST parameter: email.
+
+    When `RESEND_EMAIL_COOLDOWN` is set, repeated requests for the same
+    address within the cooldown are answered from the cache without any
+    database query or e-mail being sent.
     """
     permission_classes = (AllowAny,)
     serializer_class = ResendEmailVerificationSerializer
     queryset = EmailAddress.objects.all()
 
+    def get_cooldown_cache_key(self, email):
+        digest = hashlib.sha256(email.lower().encode()).hexdigest()
+        return f'dj_rest_auth:resend_email:{digest}'
+
+    def send_confirmation(self, request, email_address):
+        """
+        Send the confirmation e-mail. Override this to hand the e-mail over to
+        a task queue instead of sending it while the client waits.
+        """
+        email_address.send_confirmation(request)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        email = self.get_queryset().filter(**serializer.validated_data).first()
-        if email and not email.verified:
-            email.send_confirmation(request)
+        cooldown = api_settings.RESEND_EMAIL_COOLDOWN
+        cache_key = None
+        if cooldown:
+            # `add` only succeeds for the first request of the cooldown,
+            # concurrent retries of the same address stop here.
+            cache_key = self.get_cooldown_cache_key(serializer.validated_data['email'])
+            if not cache.add(cache_key, True, cooldown):
+                return Response(get_detail(gettext_noop('ok')), status=status.HTTP_200_OK)
+
+        try:
+            email = self.get_queryset().filter(**serializer.validated_data).first()
+            if email and not email.verified:
+                self.send_confirmation(request, email)
+        except Exception:
+            # Nothing was sent, the client may retry right away.
+            if cache_key:
+                cache.delete(cache_key)
+            raise
 
-        return Response({'detail': _('ok')}, status=status.HTTP_200_OK)
+        return Response(get_detail(gettext_noop('ok')), status=status.HTTP_200_OK)
 
 
 class SocialLoginView(LoginView):
@@ -167,6 +281,19 @@ class SocialLoginView(LoginView):
     """
     serializer_class = SocialLoginSerializer
 
+    def get_prefetch_requests(self, adapter, token):
+        """
+        Return the `(url, headers)` GET requests the adapter sends to the
+        provider once it has the access token, like the profile and e-mail
+        fetches. They are sent concurrently when the social account adapter
+        uses `dj_rest_auth.registration.adapter.PrefetchMixin`, which
+        returns the requests of the GitHub and LinkedIn adapters.
+        """
+        social_adapter = get_social_adapter(self.request)
+        if not isinstance(social_adapter, PrefetchMixin):
+            return []
+        return social_adapter.get_prefetch_requests(adapter, token)
+
     def process_login(self):
         get_adapter(self.request).login(self.request, self.user)
 
@@ -190,21 +317,97 @@ class SocialConnectView(LoginView):
         get_adapter(self.request).login(self.request, self.user)
 
 
-class SocialAccountListView(ListAPIView):
+def _social_account_changed(sender, instance, **kwargs):
+    if api_settings.SOCIAL_ACCOUNT_LIST_CACHE_TIMEOUT:
+        transaction.on_commit(lambda: bump_cache_version('social_accounts', instance.user_id))
+
+
+post_save.connect(_social_account_changed, sender=SocialAccount, dispatch_uid='dj_rest_auth_social_account_saved')
+post_delete.connect(_social_account_changed, sender=SocialAccount, dispatch_uid='dj_rest_auth_social_account_deleted')
+
+
+class SocialAccountPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        self.page_size = api_settings.SOCIAL_ACCOUNT_LIST_PAGE_SIZE
+        return super().get_page_size(request)
+
+
+class SocialAccountListView(FastJSONRendererMixin, ListAPIView):
     """
     List SocialAccounts for the currently logged in user
+
+    Only the serialized columns are loaded. The response carries an ETag
+    and conditional requests are answered with 304 Not Modified. The list
+    is paginated when `SOCIAL_ACCOUNT_LIST_PAGE_SIZE` is set and cached per
+    user when `SOCIAL_ACCOUNT_LIST_CACHE_TIMEOUT` is set.
     """
     serializer_class = SocialAccountSerializer
     permission_classes = (IsAuthenticated,)
 
+    @property
+    def pagination_class(self):
+        if api_settings.SOCIAL_ACCOUNT_LIST_PAGE_SIZE:
+            return SocialAccountPagination
+        return drf_settings.DEFAULT_PAGINATION_CLASS
+
     def get_queryset(self):
-        return SocialAccount.objects.filter(user=self.request.user)
+        queryset = SocialAccount.objects.filter(user=self.request.user).order_by('pk')
+        fields = self.get_serialized_fields()
+        if fields:
+            queryset = queryset.only(*fields)
+        return queryset
+
+    def get_serialized_fields(self):
+        """
+        Return the columns read by the serializer, or None when it reads
+        anything else than the concrete fields of `SocialAccount`.
+        """
+        columns = {field.name for field in SocialAccount._meta.concrete_fields}
+        sources = {field.source for field in self.get_serializer().fields.values()}
+        if sources <= columns:
+            return sources
+        return None
+
+    def get_account_data(self):
+        timeout = api_settings.SOCIAL_ACCOUNT_LIST_CACHE_TIMEOUT
+        if timeout:
+            cache_key = get_versioned_cache_key('social_accounts', self.request.user.pk)
+            data = cache.get(cache_key)
+            if data is not None:
+                return data
+        data = [dict(item) for item in self.get_serializer(self.get_queryset(), many=True).data]
+        if timeout:
+            cache.set(cache_key, data, timeout)
+        return data
+
+    def get_etag(self, data):
+        return get_etag([self.request.get_full_path(), data])
+
+    def list(self, request, *args, **kwargs):
+        data = self.get_account_data()
+        etag = self.get_etag(data)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            page = self.paginate_queryset(data)
+            if page is not None:
+                response = self.get_paginated_response(page)
+            else:
+                response = Response(data)
+        response['ETag'] = etag
+        return response
 
 
-class SocialAccountDisconnectView(GenericAPIView):
+class SocialAccountDisconnectView(FastJSONRendererMixin, GenericAPIView):
     """
     Disconnect SocialAccount from remote service for
     the currently logged in user
+
+    The ownership check, the adapter's `validate_disconnect` and the delete
+    run in one transaction, on the locked accounts of the user.
     """
     serializer_class = SocialConnectSerializer
     permission_classes = (IsAuthenticated,)
@@ -213,14 +416,20 @@ class SocialAccountDisconnectView(GenericAPIView):
         return SocialAccount.objects.filter(user=self.request.user)
 
     def post(self, request, *args, **kwargs):
-        accounts = self.get_queryset()
-        account = accounts.filter(pk=kwargs['pk']).first()
-        if not account:
-            raise NotFound
-
-        get_social_adapter(self.request).validate_disconnect(account, accounts)
-
-        account.delete()
+        with transaction.atomic():
+            # All the accounts of the user are locked, in a stable order, so
+            # concurrent disconnects of the same user run one after the other
+            # and each one validates against the accounts left by the other.
+            accounts = self.get_queryset().select_for_update().order_by('pk')
+            # Evaluating the queryset fills its cache: the adapter can iterate
+            # or count the accounts without querying them again.
+            account = next((account for account in accounts if str(account.pk) == str(kwargs['pk'])), None)
+            if not account:
+                raise NotFound
+
+            get_social_adapter(self.request).validate_disconnect(account, accounts)
+
+            account.delete()
         signals.social_account_removed.send(
             sender=SocialAccount,
             request=self.request,
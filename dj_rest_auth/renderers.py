@@ -0,0 +1,49 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .app_settings import api_settings
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with `orjson` when it is installed.
+
+    The output is the same as JSONRenderer's compact output, except that
+    NaN and infinite floats are rendered as null. Values orjson doesn't
+    encode itself, like lazy translations and datetimes, are converted by
+    DRF's encoder. Indented output, ASCII-only output and installations
+    without orjson use JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Like JSONRenderer, escape \u2028 and \u2029 so the output is a
+        # strict javascript subset.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONRendererMixin:
+    """
+    Mixin for the views of dj-rest-auth rendering their JSON responses with
+    `FastJSONRenderer` when the `FAST_JSON_RENDERER` setting is enabled.
+    """
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not api_settings.FAST_JSON_RENDERER:
+            return renderers
+        return [FastJSONRenderer() if type(renderer) is JSONRenderer else renderer for renderer in renderers]
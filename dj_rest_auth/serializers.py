@@ -6,6 +6,9 @@ from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
 from rest_framework import exceptions, serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField
+from rest_framework.serializers import raise_errors_on_nested_writes
+from rest_framework.utils import model_meta
 
 from .app_settings import api_settings
 
@@ -171,6 +174,49 @@ class UserDetailsSerializer(serializers.ModelSerializer):
         username = get_adapter().clean_username(username)
         return username
 
+    def update(self, instance, validated_data):
+        """
+        Save only the columns whose value changed, instead of every column
+        of the user, and skip the save altogether when nothing changed.
+        """
+        raise_errors_on_nested_writes('update', self, validated_data)
+        relations = model_meta.get_field_info(instance).relations
+        concrete_fields = {field.name: field for field in instance._meta.concrete_fields}
+
+        changed = []
+        save_all = False
+        many_to_many = []
+        for attr, value in validated_data.items():
+            if attr in relations and relations[attr].to_many:
+                many_to_many.append((attr, value))
+                continue
+            field = concrete_fields.get(attr)
+            if field is None:
+                # Not a column, like a property: the columns it sets are
+                # unknown.
+                setattr(instance, attr, value)
+                save_all = True
+                continue
+            current = field.value_from_object(instance)
+            new = value.pk if field.is_relation and value is not None else value
+            if current != new:
+                setattr(instance, attr, value)
+                changed.append(attr)
+
+        if save_all:
+            instance.save()
+        elif changed:
+            changed += [
+                name for name, field in concrete_fields.items()
+                if getattr(field, 'auto_now', False) and name not in changed
+            ]
+            instance.save(update_fields=changed)
+
+        for attr, value in many_to_many:
+            getattr(instance, attr).set(value)
+
+        return instance
+
     class Meta:
         extra_fields = []
         # see https://github.com/iMerica/dj-rest-auth/issues/181
@@ -190,6 +236,78 @@ class UserDetailsSerializer(serializers.ModelSerializer):
         read_only_fields = ('email',)
 
 
+_compiled_fields = {}
+
+# Fields of these types depend on the request or on other serializers,
+# they are only rendered by the serializer itself.
+_uncompiled_field_types = (
+    serializers.SerializerMethodField, serializers.FileField, serializers.BaseSerializer,
+    serializers.RelatedField, serializers.ManyRelatedField,
+)
+
+
+def _is_compilable(field):
+    if type(field).__module__ != serializers.Field.__module__:
+        return False
+    return not isinstance(field, _uncompiled_field_types)
+
+
+def get_compiled_fields(serializer_class):
+    """
+    Return the readable fields of `serializer_class` as a list of
+    `(name, get_attribute, to_representation)` tuples, built once per
+    class, or None when instances of the class must be rendered by the
+    serializer itself.
+
+    Only serializers using the stock DRF field construction and
+    representation, whose fields are all plain DRF fields, are compiled.
+    """
+    try:
+        return _compiled_fields[serializer_class]
+    except KeyError:
+        pass
+
+    compiled = None
+    stock_methods = (
+        serializer_class.__init__ is serializers.BaseSerializer.__init__,
+        serializer_class.to_representation is serializers.Serializer.to_representation,
+        serializer_class.get_fields in (serializers.Serializer.get_fields, serializers.ModelSerializer.get_fields),
+    )
+    if all(stock_methods):
+        fields = list(serializer_class(context={})._readable_fields)
+        if all(_is_compilable(field) for field in fields):
+            compiled = [(field.field_name, field.get_attribute, field.to_representation) for field in fields]
+    _compiled_fields[serializer_class] = compiled
+    return compiled
+
+
+def represent(instance, compiled):
+    """
+    Render `instance` with fields compiled by `get_compiled_fields`, the
+    same way `Serializer.to_representation` does.
+    """
+    ret = {}
+    for name, get_attribute, to_representation in compiled:
+        try:
+            attribute = get_attribute(instance)
+        except SkipField:
+            continue
+        ret[name] = None if attribute is None else to_representation(attribute)
+    return ret
+
+
+def get_user_data(user, context):
+    """
+    Render `user` with the USER_DETAILS_SERIALIZER, using its compiled
+    fields when possible.
+    """
+    user_serializer = api_settings.USER_DETAILS_SERIALIZER
+    compiled = get_compiled_fields(user_serializer)
+    if compiled is not None:
+        return represent(user, compiled)
+    return user_serializer(user, context=context).data
+
+
 class JWTSerializer(serializers.Serializer):
     """
     Serializer for JWT authentication.
@@ -203,10 +321,7 @@ class JWTSerializer(serializers.Serializer):
         Required to allow using custom USER_DETAILS_SERIALIZER in
         JWTSerializer. Defining it here to avoid circular imports
         """
-        JWTUserDetailsSerializer = api_settings.USER_DETAILS_SERIALIZER
-
-        user_data = JWTUserDetailsSerializer(obj['user'], context=self.context).data
-        return user_data
+        return get_user_data(obj['user'], self.context)
 
 
 class JWTSerializerWithExpiration(JWTSerializer):
@@ -217,6 +332,33 @@ class JWTSerializerWithExpiration(JWTSerializer):
     refresh_expiration = serializers.DateTimeField()
 
 
+format_datetime = serializers.DateTimeField().to_representation
+
+
+def get_auth_response_data(serializer_class, instance, context):
+    """
+    Return the data of `serializer_class` for `instance`, the token or the
+    JWT data of a login or registration.
+
+    The stock TokenSerializer, JWTSerializer and JWTSerializerWithExpiration
+    always have the same shape, their data is built directly instead of
+    going through the serializer fields. Any other serializer is used as is.
+    """
+    if serializer_class is TokenSerializer:
+        return {'key': str(instance.key)}
+    if serializer_class is JWTSerializer or serializer_class is JWTSerializerWithExpiration:
+        data = {
+            'access': str(instance['access']),
+            'refresh': str(instance['refresh']),
+            'user': get_user_data(instance['user'], context),
+        }
+        if serializer_class is JWTSerializerWithExpiration:
+            data['access_expiration'] = format_datetime(instance['access_expiration'])
+            data['refresh_expiration'] = format_datetime(instance['refresh_expiration'])
+        return data
+    return serializer_class(instance=instance, context=context).data
+
+
 class PasswordResetSerializer(serializers.Serializer):
     """
     Serializer for requesting a password reset e-mail.
@@ -0,0 +1,17 @@
+from django.dispatch import Signal
+
+
+# Sent after a password went through the configured password validators.
+# Arguments: `user`, the (possibly unsaved) user the password was checked
+# against, and `duration`, the time spent in the validators in seconds.
+password_validated = Signal()
+
+# Sent after a social login was completed with the provider, before new
+# users are signed up. Arguments: `provider`, the id of the provider, and
+# `duration`, the time spent completing the login in seconds.
+social_login_completed = Signal()
+
+# Sent when `LoginView` skips the session login which `SESSION_LOGIN`
+# enables, because the client only uses the returned token. Arguments:
+# `request` and `user`.
+session_login_skipped = Signal()
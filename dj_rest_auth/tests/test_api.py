@@ -1,17 +1,22 @@
 import json
+from unittest import mock
 
 from allauth.account import app_settings as allauth_account_settings
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
 from django.core import mail
 from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase, modify_settings, override_settings
+from django.utils.dateparse import parse_datetime
 from django.utils.encoding import force_str
 from rest_framework import status
 from rest_framework.test import APIRequestFactory
 from dj_rest_auth.app_settings import api_settings
 from dj_rest_auth.registration.views import RegisterView
 from dj_rest_auth.models import get_token_model
+from dj_rest_auth.tokens.models import UserSession
+from dj_rest_auth.renderers import FastJSONRenderer
 from .mixins import TestsMixin
 from .utils import override_api_settings
 
@@ -249,6 +254,32 @@ class APIBasicTests(TestsMixin, TestCase):
         self.assertEqual('access' in self.response.json.keys(), True)
         self.token = self.response.json['access']
 
+    @override_api_settings(SESSION_LOGIN_SKIP_HEADER='X-Token-Only')
+    def test_login_skip_session(self):
+        from dj_rest_auth.signals import session_login_skipped
+
+        get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+        payload = {
+            'username': self.USERNAME,
+            'password': self.PASS,
+        }
+        calls = []
+
+        def receiver(sender, request, user, **kwargs):
+            calls.append(user.username)
+
+        session_login_skipped.connect(receiver)
+        self.addCleanup(session_login_skipped.disconnect, receiver)
+
+        self.post(self.login_url, data=payload, HTTP_X_TOKEN_ONLY='true', status_code=200)
+        self.assertIn('key', self.response.json)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.response.cookies)
+        self.assertEqual(calls, [self.USERNAME])
+
+        self.post(self.login_url, data=payload, status_code=200)
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.response.cookies)
+        self.assertEqual(calls, [self.USERNAME])
+
     @modify_settings(INSTALLED_APPS={'remove': ['allauth', 'allauth.account']})
     def test_login_by_email(self):
         payload = {
@@ -495,6 +526,81 @@ class APIBasicTests(TestsMixin, TestCase):
         self.assertEqual(user.last_name, self.response.json['last_name'])
         self.assertEqual(user.email, self.response.json['email'])
 
+    def _user_details_login(self):
+        user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        self.post(self.login_url, data={'username': self.USERNAME, 'password': self.PASS}, status_code=200)
+        self.token = self.response.json['key']
+        return user
+
+    def test_user_details_conditional_get(self):
+        self._user_details_login()
+        self.get(self.user_url, status_code=200)
+        etag = self.response['ETag']
+
+        self.get(self.user_url, HTTP_IF_NONE_MATCH=etag, status_code=304)
+        self.assertEqual(self.response.content, b'')
+
+        self.patch(self.user_url, data={'first_name': 'John'}, status_code=200)
+        self.get(self.user_url, HTTP_IF_NONE_MATCH=etag, status_code=200)
+        self.assertEqual(self.response.json['first_name'], 'John')
+        self.assertNotEqual(self.response['ETag'], etag)
+
+    def test_user_details_fields(self):
+        user = self._user_details_login()
+        self.get(self.user_url, data={'fields': 'pk,email,unknown'}, status_code=200)
+        self.assertEqual(self.response.json, {'pk': user.pk, 'email': self.EMAIL})
+
+    def test_user_details_update_saves_changed_columns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._user_details_login()
+        user_table = get_user_model()._meta.db_table
+
+        def user_updates():
+            return [
+                query['sql'] for query in queries
+                if query['sql'].startswith(f'UPDATE "{user_table}"')
+            ]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.patch(self.user_url, data={'first_name': 'John'}, status_code=200)
+        self.assertEqual(len(user_updates()), 1)
+        self.assertIn('"first_name"', user_updates()[0])
+        self.assertNotIn('"last_name"', user_updates()[0])
+        self.assertNotIn('"password"', user_updates()[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.patch(self.user_url, data={'first_name': 'John'}, status_code=200)
+        self.assertEqual(user_updates(), [])
+        self.assertEqual(self.response.json['first_name'], 'John')
+        self.assertEqual(get_user_model().objects.get(username=self.USERNAME).first_name, 'John')
+
+    @override_api_settings(USER_DETAILS_CACHE_TIMEOUT=60)
+    def test_user_details_cache(self):
+        from django.core.cache import cache
+        from dj_rest_auth.serializers import UserDetailsSerializer
+
+        cache.clear()
+        user = self._user_details_login()
+        self.get(self.user_url, status_code=200)
+
+        with mock.patch.object(UserDetailsSerializer, 'to_representation') as to_representation:
+            self.get(self.user_url, status_code=200)
+            self.get(self.user_url, data={'fields': 'username'}, status_code=200)
+        to_representation.assert_not_called()
+        self.assertEqual(self.response.json, {'username': self.USERNAME})
+
+        self.patch(self.user_url, data={'first_name': 'John'}, status_code=200)
+        self.get(self.user_url, status_code=200)
+        self.assertEqual(self.response.json['first_name'], 'John')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            get_user_model().objects.filter(pk=user.pk).update(last_name='Smith')
+            get_user_model().objects.get(pk=user.pk).save()
+        self.get(self.user_url, status_code=200)
+        self.assertEqual(self.response.json['last_name'], 'Smith')
+
     @override_api_settings(USE_JWT=True)
     def test_user_details_using_jwt(self):
         user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
@@ -533,6 +639,33 @@ class APIBasicTests(TestsMixin, TestCase):
     def test_registration_honors_password_validators(self):
         self.post(self.register_url, data=self.REGISTRATION_DATA, status_code=400)
 
+    @override_settings(AUTH_PASSWORD_VALIDATORS=[
+        {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
+    ])
+    def test_registration_validates_password_once(self):
+        from dj_rest_auth.signals import password_validated
+
+        calls = []
+
+        def receiver(sender, user, duration, **kwargs):
+            calls.append((user.username, duration))
+
+        data = self.REGISTRATION_DATA.copy()
+        data.update(password1='x7-Unrelated', password2='x7-Unrelated')
+        password_validated.connect(receiver)
+        try:
+            self.post(self.register_url, data=data, status_code=201)
+        finally:
+            password_validated.disconnect(receiver)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][0], self.USERNAME)
+
+        # the password is still checked against the submitted username
+        data.update(username='johnsmith1234', password1='johnsmith1234', password2='johnsmith1234')
+        result = self.post(self.register_url, data=data, status_code=400)
+        self.assertIn('password1', result.json)
+
     @override_api_settings(REGISTER_PERMISSION_CLASSES=('tests.mixins.CustomPermissionClass',))
     def test_registration_with_custom_permission_class(self):
         class CustomRegisterView(RegisterView):
@@ -591,6 +724,149 @@ class APIBasicTests(TestsMixin, TestCase):
         self._login()
         self._logout()
 
+    def test_bulk_registration(self):
+        rows = [
+            {'username': 'bulk1', 'email': 'bulk1@world.com', 'password1': self.PASS, 'password2': self.PASS},
+            {'username': 'bulk2', 'password1': self.PASS, 'password2': 'mismatch'},
+            {'username': 'BULK1', 'email': 'other@world.com', 'password1': self.PASS, 'password2': self.PASS},
+            {'username': 'bulk3', 'email': 'bulk3@world.com', 'password1': self.PASS, 'password2': self.PASS},
+        ]
+
+        # only staff users may register in bulk
+        self.post(self.bulk_register_url, data={'users': rows}, status_code=403)
+
+        get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS, is_staff=True)
+        self._login()
+        result = self.post(self.bulk_register_url, data={'users': rows}, status_code=200)
+
+        results = result.json['results']
+        self.assertEqual(len(results), len(rows))
+        self.assertIn('pk', results[0])
+        self.assertIn('non_field_errors', results[1]['errors'])
+        self.assertIn('username', results[2]['errors'])
+        self.assertIn('pk', results[3])
+
+        new_user = get_user_model().objects.get(pk=results[3]['pk'])
+        self.assertTrue(new_user.check_password(self.PASS))
+        self.assertTrue(new_user.emailaddress_set.filter(email='bulk3@world.com', primary=True).exists())
+
+    def test_bulk_registration_checks_availability_once(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from dj_rest_auth.registration.serializers import BulkRegisterSerializer
+
+        taken = get_user_model().objects.create_user('bulk0', 'bulk0@world.com', self.PASS)
+        taken.emailaddress_set.create(email='bulk0@world.com', verified=True, primary=True)
+
+        def validate(count):
+            rows = [
+                {'username': f'bulk{i}', 'email': f'bulk{i}@world.com', 'password1': self.PASS, 'password2': self.PASS}
+                for i in range(count)
+            ]
+            rows.append({'username': 'BULK0', 'email': 'new@world.com', 'password1': self.PASS, 'password2': self.PASS})
+            rows.append({'username': 'new', 'email': 'Bulk0@World.com', 'password1': self.PASS, 'password2': self.PASS})
+            serializer = BulkRegisterSerializer(data={'users': rows})
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(serializer.is_valid())
+            return serializer, len(queries)
+
+        for preserve_casing in (False, True):
+            with override_settings(ACCOUNT_PRESERVE_USERNAME_CASING=preserve_casing):
+                serializer, few = validate(2)
+                self.assertEqual(len(serializer.rows), 1)
+                self.assertEqual(set(serializer.row_errors), {0, 2, 3})
+                self.assertIn('username', serializer.row_errors[2])
+                self.assertIn('email', serializer.row_errors[3])
+                self.assertEqual(validate(50)[1], few)
+
+    def test_bulk_registration_maps_integrity_errors_to_rows(self):
+        from dj_rest_auth.registration.serializers import BulkRegisterSerializer, UniqueRegistrationValidator
+
+        rows = [
+            {'username': f'bulk{i}', 'email': f'bulk{i}@world.com', 'password1': self.PASS, 'password2': self.PASS}
+            for i in range(3)
+        ]
+        serializer = BulkRegisterSerializer(data={'users': rows})
+        self.assertTrue(serializer.is_valid())
+
+        # bulk1 is registered between the validation and the insert.
+        get_user_model().objects.create_user('bulk1', '', self.PASS)
+        taken = {('username', 'bulk1')}
+        with mock.patch.object(UniqueRegistrationValidator, 'get_batch_conflicts', return_value=taken) as conflicts:
+            serializer.save(None)
+        self.assertEqual(conflicts.call_count, 1)
+
+        self.assertIn('username', serializer.results[1]['errors'])
+        for index in (0, 2):
+            user = get_user_model().objects.get(pk=serializer.results[index]['pk'])
+            self.assertEqual(user.username, f'bulk{index}')
+            self.assertTrue(user.emailaddress_set.filter(email=f'bulk{index}@world.com').exists())
+
+    def test_bulk_register_command(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        rows = [
+            {'username': f'bulk{i}', 'email': f'bulk{i}@world.com', 'password1': self.PASS, 'password2': self.PASS}
+            for i in range(5)
+        ]
+        stdout = StringIO()
+        call_command('bulk_register', '-', '--batch-size=2', stdin=StringIO(json.dumps(rows)), stdout=stdout)
+
+        self.assertIn('Registered 5 users', stdout.getvalue())
+        self.assertEqual(get_user_model().objects.filter(username__startswith='bulk').count(), 5)
+
+    def test_registration_with_taken_username_and_email(self):
+        user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        user.emailaddress_set.create(email=self.EMAIL, verified=True, primary=True)
+
+        data = self.REGISTRATION_DATA_WITH_EMAIL.copy()
+        data['username'] = self.USERNAME.upper()
+        result = self.post(self.register_url, data=data, status_code=400)
+        self.assertIn('username', result.json)
+        self.assertIn('email', result.json)
+
+    def test_registration_conflicts_single_query(self):
+        from dj_rest_auth.registration.serializers import UniqueRegistrationValidator
+
+        user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        user.emailaddress_set.create(email=self.EMAIL, verified=True, primary=True)
+        validator = UniqueRegistrationValidator()
+        with self.assertNumQueries(1):
+            self.assertEqual(validator.get_conflicts(self.USERNAME, self.EMAIL), {'username', 'email'})
+        self.assertEqual(validator.get_conflicts('someone', self.EMAIL.upper()), {'email'})
+        self.assertEqual(validator.get_conflicts(self.USERNAME, 'someone@example.com'), {'username'})
+        self.assertEqual(validator.get_conflicts('someone', 'someone@example.com'), set())
+
+    def test_registration_conflicts_with_ordered_user_model(self):
+        from unittest import mock
+
+        from dj_rest_auth.registration.serializers import UniqueRegistrationValidator
+
+        get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        # Compound statements don't allow an ORDER BY in their parts.
+        with mock.patch.object(get_user_model()._meta, 'ordering', ['username']):
+            self.assertEqual(
+                UniqueRegistrationValidator().get_conflicts(self.USERNAME, 'someone@example.com'), {'username'},
+            )
+
+    def test_registration_maps_integrity_error_to_field_error(self):
+        from unittest import mock
+
+        from dj_rest_auth.registration.serializers import UniqueRegistrationValidator
+
+        get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+        user_count = get_user_model().objects.count()
+
+        # simulate a concurrent registration taking the username after validation
+        with mock.patch.object(UniqueRegistrationValidator, '__call__', return_value=None):
+            result = self.post(self.register_url, data=self.REGISTRATION_DATA, status_code=400)
+
+        self.assertIn('username', result.json)
+        self.assertEqual(get_user_model().objects.count(), user_count)
+
     def test_registration_with_invalid_password(self):
         data = self.REGISTRATION_DATA.copy()
         data['password2'] = 'foobar'
@@ -668,6 +944,50 @@ class APIBasicTests(TestsMixin, TestCase):
         self._login()
         self._logout()
 
+    @override_api_settings(STATELESS_EMAIL_VERIFICATION=True)
+    @override_settings(ACCOUNT_EMAIL_CONFIRMATION_HMAC=True)
+    def test_stateless_email_verification(self):
+        from allauth.account.models import EmailConfirmationHMAC
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        email_address = user.emailaddress_set.create(email=self.EMAIL, primary=True, verified=False)
+        key = EmailConfirmationHMAC(email_address).key
+
+        # a tampered key is rejected without touching the database
+        with self.assertNumQueries(0):
+            self.post(self.verify_email_url, data={'key': key + 'x'}, status_code=status.HTTP_404_NOT_FOUND)
+
+        self.post(self.verify_email_url, data={'key': key}, status_code=status.HTTP_200_OK)
+        email_address.refresh_from_db()
+        self.assertTrue(email_address.verified)
+
+        # replaying the key costs the lookup of a verified duplicate, an
+        # UPDATE matching no row and a lookup of the address, which is
+        # already verified
+        with CaptureQueriesContext(connection) as queries:
+            self.post(self.verify_email_url, data={'key': key}, status_code=status.HTTP_200_OK)
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 3)
+
+        email_address.delete()
+        self.post(self.verify_email_url, data={'key': key}, status_code=status.HTTP_404_NOT_FOUND)
+
+    @override_api_settings(STATELESS_EMAIL_VERIFICATION=True)
+    @override_settings(ACCOUNT_EMAIL_CONFIRMATION_HMAC=True, ACCOUNT_UNIQUE_EMAIL=True)
+    def test_stateless_email_verification_with_verified_duplicate(self):
+        from allauth.account.models import EmailConfirmationHMAC
+
+        other = get_user_model().objects.create_user('other', self.EMAIL, self.PASS)
+        other.emailaddress_set.create(email=self.EMAIL, primary=True, verified=True)
+        user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        email_address = user.emailaddress_set.create(email=self.EMAIL, primary=True, verified=False)
+
+        key = EmailConfirmationHMAC(email_address).key
+        self.post(self.verify_email_url, data={'key': key}, status_code=status.HTTP_404_NOT_FOUND)
+        email_address.refresh_from_db()
+        self.assertFalse(email_address.verified)
+
     def test_should_not_resend_email_verification_for_nonexistent_email(self):
         # mail count before resend
         mail_count = len(mail.outbox)
@@ -683,6 +1003,45 @@ class APIBasicTests(TestsMixin, TestCase):
         # verify that mail count did not increment
         self.assertEqual(mail_count, len(mail.outbox))
 
+    @override_api_settings(RESEND_EMAIL_COOLDOWN=60)
+    def test_resend_email_verification_cooldown(self):
+        from django.core.cache import cache
+
+        user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        user.emailaddress_set.create(email=self.EMAIL, primary=True, verified=False)
+        mail_count = len(mail.outbox)
+        self.addCleanup(cache.clear)
+
+        self.post(self.resend_email_url, data={'email': self.EMAIL}, status_code=status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), mail_count + 1)
+
+        # retries within the cooldown are answered from the cache
+        with self.assertNumQueries(0):
+            self.post(self.resend_email_url, data={'email': self.EMAIL.upper()}, status_code=status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), mail_count + 1)
+
+        cache.clear()
+        self.post(self.resend_email_url, data={'email': self.EMAIL}, status_code=status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), mail_count + 2)
+
+    @override_api_settings(RESEND_EMAIL_COOLDOWN=60)
+    def test_resend_email_verification_cooldown_released_on_error(self):
+        from allauth.account.models import EmailAddress
+        from django.core.cache import cache
+
+        user = get_user_model().objects.create_user(self.USERNAME, self.EMAIL, self.PASS)
+        user.emailaddress_set.create(email=self.EMAIL, primary=True, verified=False)
+        mail_count = len(mail.outbox)
+        self.addCleanup(cache.clear)
+
+        with mock.patch.object(EmailAddress, 'send_confirmation', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                self.post(self.resend_email_url, data={'email': self.EMAIL})
+
+        # The failed request doesn't start the cooldown.
+        self.post(self.resend_email_url, data={'email': self.EMAIL}, status_code=status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), mail_count + 1)
+
     @override_settings(ACCOUNT_LOGOUT_ON_GET=True)
     def test_logout_on_get(self):
         payload = {
@@ -709,6 +1068,116 @@ class APIBasicTests(TestsMixin, TestCase):
         self.post(self.login_url, data=payload, status_code=status.HTTP_200_OK)
         self.get(self.logout_url, status_code=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    def test_logout_deletes_token_by_key(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        payload = {
+            'username': self.USERNAME,
+            'password': self.PASS,
+        }
+        get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+        self.post(self.login_url, data=payload, status_code=status.HTTP_200_OK)
+        self.token = self.response.json['key']
+
+        token_table = get_token_model()._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            self.post(self.logout_url, status_code=status.HTTP_200_OK)
+        token_queries = [
+            query['sql'] for query in queries.captured_queries
+            if token_table in query['sql'] and 'WHERE' in query['sql'] and 'auth_user' not in query['sql']
+        ]
+        self.assertEqual(len(token_queries), 1)
+        self.assertTrue(token_queries[0].startswith('DELETE'))
+        self.assertFalse(get_token_model().objects.exists())
+
+    def test_logout_with_token_model_without_user(self):
+        payload = {
+            'username': self.USERNAME,
+            'password': self.PASS,
+        }
+        get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+        self.post(self.login_url, data=payload, status_code=status.HTTP_200_OK)
+
+        # A custom token model without a user field is left alone.
+        with override_api_settings(TOKEN_MODEL='django.contrib.sessions.models.Session'):
+            self.post(self.logout_url, status_code=status.HTTP_200_OK)
+        self.post(self.login_url, data=payload, status_code=status.HTTP_200_OK)
+        with override_api_settings(TOKEN_MODEL='django.contrib.sessions.models.Session'):
+            self.post(reverse('rest_logout_all'), status_code=status.HTTP_200_OK)
+
+    def test_logout_all(self):
+        from .mixins import APIClient
+
+        payload = {
+            'username': self.USERNAME,
+            'password': self.PASS,
+        }
+        user = get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+        other = get_user_model().objects.create_user('other', '', self.PASS)
+        other_client = APIClient()
+        other_client.force_login(other)
+        for _ in range(2):
+            APIClient().post(self.login_url, data=payload)
+        self.post(self.login_url, data=payload, status_code=status.HTTP_200_OK)
+        self.assertEqual(Session.objects.count(), 4)
+
+        self.post(reverse('rest_logout_all'), status_code=status.HTTP_200_OK)
+        self.assertFalse(get_token_model().objects.filter(user=user).exists())
+        self.assertEqual(
+            [session.get_decoded().get('_auth_user_id') for session in Session.objects.all()],
+            [str(other.pk)],
+        )
+        self.get(self.user_url, status_code=status.HTTP_403_FORBIDDEN)
+        self.assertEqual(other_client.get(self.user_url).status_code, status.HTTP_200_OK)
+        self.assertEqual(list(UserSession.objects.values_list('user', flat=True)), [other.pk])
+
+    def test_user_sessions_recorded(self):
+        from .mixins import APIClient
+
+        payload = {
+            'username': self.USERNAME,
+            'password': self.PASS,
+        }
+        user = get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+        client = APIClient()
+        client.post(self.login_url, data=payload)
+        first = client.session.session_key
+        self.assertEqual(UserSession.objects.get().session_key, first)
+
+        # The keys of the sessions which ended are forgotten on the next
+        # login of the user.
+        expired = APIClient()
+        expired.post(self.login_url, data=payload)
+        Session.objects.filter(session_key=expired.session.session_key).delete()
+        APIClient().post(self.login_url, data=payload)
+        self.assertEqual(UserSession.objects.filter(user=user).count(), 2)
+        self.assertFalse(UserSession.objects.filter(session_key=expired.session.session_key).exists())
+
+        client.post(self.logout_url)
+        self.assertEqual(UserSession.objects.count(), 1)
+
+    @override_api_settings(USE_JWT=True)
+    @override_api_settings(JWT_AUTH_HTTPONLY=False)
+    def test_logout_all_blacklists_refresh_tokens(self):
+        payload = {
+            'username': self.USERNAME,
+            'password': self.PASS,
+        }
+        get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+        refresh_tokens = [
+            self.post(self.login_url, data=payload, status_code=status.HTTP_200_OK).data['refresh']
+            for _ in range(2)
+        ]
+        self.token = self.response.data['access']
+
+        self.post(reverse('rest_logout_all'), status_code=status.HTTP_200_OK)
+        del self.token
+        for refresh_token in refresh_tokens:
+            self.post(
+                reverse('token_refresh'), data={'refresh': refresh_token}, status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+
     @override_api_settings(USE_JWT=True)
     @override_api_settings(JWT_AUTH_COOKIE='jwt-auth')
     def test_login_jwt_sets_cookie(self):
@@ -1069,6 +1538,23 @@ class APIBasicTests(TestsMixin, TestCase):
         self.assertIn('access_expiration', resp.data.keys())
         self.assertIn('refresh_expiration', resp.data.keys())
 
+    @override_api_settings(JWT_AUTH_RETURN_EXPIRATION=True)
+    @override_api_settings(USE_JWT=True)
+    @override_api_settings(FAST_JSON_RENDERER=True)
+    def test_login_fast_json_renderer(self):
+        payload = {
+            'username': self.USERNAME,
+            'password': self.PASS,
+        }
+        get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+
+        resp = self.post(self.login_url, data=payload, status_code=200)
+        self.assertIsInstance(resp.accepted_renderer, FastJSONRenderer)
+        data = json.loads(resp.content)
+        self.assertEqual(list(data), ['access', 'refresh', 'user', 'access_expiration', 'refresh_expiration'])
+        self.assertEqual(data['user']['username'], self.USERNAME)
+        self.assertIsNotNone(parse_datetime(data['access_expiration']))
+
     @override_api_settings(JWT_AUTH_RETURN_EXPIRATION=True)
     @override_api_settings(USE_JWT=True)
     @override_api_settings(JWT_AUTH_COOKIE='xxx')
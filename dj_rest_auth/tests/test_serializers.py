@@ -1,16 +1,25 @@
 
 from allauth.socialaccount.providers.facebook.views import FacebookOAuth2Adapter
+from allauth.account.models import EmailAddress
 from allauth.socialaccount.models import SocialApp
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.test import TestCase, modify_settings, override_settings
 from django.contrib.sites.models import Site
+from rest_framework import serializers
 from rest_framework.exceptions import ErrorDetail
 from rest_framework.test import APIRequestFactory, force_authenticate
 from unittest.mock import MagicMock
 
-from dj_rest_auth.serializers import PasswordChangeSerializer, UserDetailsSerializer
+from .utils import override_api_settings
+
+from dj_rest_auth.models import TokenModel
+from dj_rest_auth.serializers import (
+    JWTSerializer, JWTSerializerWithExpiration, PasswordChangeSerializer, TokenSerializer,
+    UserDetailsSerializer, get_auth_response_data, get_compiled_fields,
+)
 from dj_rest_auth.registration.serializers import SocialLoginSerializer
 from dj_rest_auth.registration.views import SocialLoginView
 
@@ -26,6 +35,7 @@ def validate_is_lower(username: str):
 
 custom_username_validators = [validate_is_lower]
 validator_path = 'dj_rest_auth.tests.test_serializers.custom_username_validators'
+method_field_serializer_path = 'dj_rest_auth.tests.test_serializers.MethodFieldUserSerializer'
 
 
 class TestUserDetailsSerializer(TestCase):
@@ -68,6 +78,49 @@ class TestUserDetailsSerializer(TestCase):
         self.assertEqual(serializer.validated_data, {'username': 'TestUsername'})
 
 
+class MethodFieldUserSerializer(UserDetailsSerializer):
+    full_name = serializers.SerializerMethodField()
+
+    class Meta(UserDetailsSerializer.Meta):
+        fields = UserDetailsSerializer.Meta.fields + ('full_name',)
+
+    def get_full_name(self, obj):
+        return f'{obj.first_name} {obj.last_name}'
+
+
+class TestJWTSerializerUser(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='alice', email='alice@test.com', first_name='Alice',
+        )
+
+    def test_compiled_user_matches_serializer(self):
+        self.assertIsNotNone(get_compiled_fields(UserDetailsSerializer))
+        data = JWTSerializer({'access': 'a', 'refresh': 'r', 'user': self.user}).data
+        self.assertEqual(data['user'], UserDetailsSerializer(self.user).data)
+
+    def test_auth_response_data_matches_serializers(self):
+        now = timezone.now()
+        data = {
+            'access': 'a', 'refresh': 'r', 'user': self.user,
+            'access_expiration': now, 'refresh_expiration': now,
+        }
+        for serializer_class in (JWTSerializer, JWTSerializerWithExpiration):
+            expected = serializer_class(data).data
+            shaped = get_auth_response_data(serializer_class, data, {})
+            self.assertEqual(list(shaped.items()), list(expected.items()))
+
+        token = TokenModel.objects.create(user=self.user)
+        self.assertEqual(get_auth_response_data(TokenSerializer, token, {}), TokenSerializer(token).data)
+
+    def test_method_fields_are_not_compiled(self):
+        self.assertIsNone(get_compiled_fields(MethodFieldUserSerializer))
+        with override_api_settings(USER_DETAILS_SERIALIZER=method_field_serializer_path):
+            data = JWTSerializer({'access': 'a', 'refresh': 'r', 'user': self.user}).data
+        self.assertEqual(data['user']['full_name'], 'Alice ')
+
+
 class TestPasswordChangeSerializer(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -151,3 +204,18 @@ class TestSocialLoginSerializer(TestCase):
         serializer = SocialLoginSerializer(data=self.request_data, context={'request': self.request, 'view': dummy_view})
         serializer.is_valid()
         self.assertDictEqual(serializer.errors, self.INCORRECT_VALUE)
+
+    def test_email_is_registered(self):
+        user = User.objects.create_user('person', 'person@world.com', 'password')
+        EmailAddress.objects.create(user=user, email='verified@world.com', verified=True)
+        EmailAddress.objects.create(user=user, email='unverified@world.com', verified=False)
+        serializer = SocialLoginSerializer()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.email_is_registered('person@world.com'))
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.email_is_registered('Verified@World.com'))
+        self.assertFalse(serializer.email_is_registered('unverified@world.com'))
+        self.assertFalse(serializer.email_is_registered('nobody@world.com'))
+        with self.assertNumQueries(0):
+            self.assertFalse(serializer.email_is_registered(''))
@@ -1,18 +1,40 @@
 import inspect
 import json
+import threading
+import time
 import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
+import jwt
 import responses
-from allauth.socialaccount.models import SocialApp
+from allauth.socialaccount.adapter import get_adapter as get_social_adapter
+from allauth.socialaccount.internal import jwtkit
+from allauth.socialaccount.models import SocialAccount, SocialApp
 from allauth.socialaccount.providers.oauth.client import OAuth
+from allauth.socialaccount.providers.github.views import GitHubOAuth2Adapter
+from allauth.socialaccount.providers.linkedin_oauth2.views import LinkedInOAuth2Adapter
+from allauth.socialaccount.providers.oauth2.client import OAuth2Error
 from allauth.socialaccount.providers.twitter.views import TwitterAPI
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
 from django.contrib.sites.models import Site
-from django.test import TestCase
-from django.test.utils import override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from rest_framework import status
 
+from dj_rest_auth.registration.adapter import (
+    PrefetchedSession, PrefetchMixin, builtin_prefetch_requests, get_pooled_session,
+)
+from dj_rest_auth.registration.metadata import metadata_cache
+from dj_rest_auth.signals import social_login_completed
+from dj_rest_auth.utils import bump_cache_version
+
 from .mixins import TestsMixin
+from .urls import MockProviderAdapter
 from .utils import override_api_settings
 
 try:
@@ -46,6 +68,346 @@ _skip_twitter_oauth = unittest.skipIf(
 )
 
 
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OAuth2 provider answering the token, profile, OpenID
+    configuration and keys endpoints, recording the client port and path of
+    every request it serves.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self, body):
+        self.server.client_ports.add(self.client_address[1])
+        self.server.paths.append(self.path)
+        time.sleep(self.server.delay)
+        if self.server.barrier:
+            # Only answers once all the expected requests are in flight.
+            self.server.barrier.wait()
+        self.server.cookies.append(self.headers.get('Cookie'))
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Set-Cookie', 'provider-session=abc; Path=/')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self._respond({'access_token': 'token1234', 'token_type': 'bearer'})
+
+    def do_GET(self):
+        base_url = f'http://127.0.0.1:{self.server.server_port}'
+        if self.path == '/.well-known/openid-configuration':
+            self._respond({'issuer': base_url, 'jwks_uri': f'{base_url}/jwks'})
+        elif self.path == '/jwks':
+            self._respond(self.server.keys)
+        elif self.path.endswith('/emails'):
+            self._respond([{'email': 'john@example.com', 'primary': True, 'verified': True}])
+        else:
+            self._respond({'id': '123123123123', 'login': 'john', 'email': 'john@example.com'})
+
+    def log_message(self, *args):
+        pass
+
+
+class MockProviderMixin:
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), MockProviderHandler)
+        self.server.client_ports = set()
+        self.server.cookies = []
+        self.server.paths = []
+        self.server.delay = 0
+        self.server.barrier = None
+        self.server.keys = {'kid-1': 'key-1'}
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+
+@override_settings(SOCIALACCOUNT_ADAPTER='dj_rest_auth.registration.adapter.SocialAccountAdapter')
+class TestPooledSession(MockProviderMixin, TestCase):
+
+    def test_adapter_returns_pooled_session(self):
+        from allauth.socialaccount.adapter import get_adapter
+
+        self.assertIs(get_adapter().get_requests_session(), get_pooled_session())
+
+    def test_connections_are_reused(self):
+        from allauth.socialaccount.adapter import get_adapter
+
+        for _ in range(3):
+            session = get_adapter().get_requests_session()
+            session.post(f'{self.base_url}/token', data={'code': 'abc'}).raise_for_status()
+            session.get(f'{self.base_url}/me').raise_for_status()
+
+        self.assertEqual(len(self.server.client_ports), 1)
+        # cookies set by the provider are not replayed on later calls
+        self.assertEqual(self.server.cookies, [None] * 6)
+
+    def test_code_exchange_through_pooled_session(self):
+        from allauth.socialaccount.providers.oauth2.client import OAuth2Client
+
+        client = OAuth2Client(
+            None, 'client-id', 'secret', 'POST', f'{self.base_url}/token', 'http://testserver/callback',
+            scope_delimiter=' ',
+        )
+        for _ in range(2):
+            self.assertEqual(client.get_access_token('abc')['access_token'], 'token1234')
+        self.assertEqual(len(self.server.client_ports), 1)
+
+
+@override_settings(SOCIALACCOUNT_ADAPTER='dj_rest_auth.registration.adapter.SocialAccountAdapter')
+class TestSocialAppCache(TestCase):
+
+    def setUp(self):
+        self.app = SocialApp.objects.create(
+            provider='facebook', name='Facebook', client_id='123123123', secret='321321321',
+        )
+        self.site = Site.objects.get_current()
+        self.app.sites.add(self.site)
+        self.request = RequestFactory().get('/')
+        self.adapter = get_social_adapter()
+
+    def test_apps_are_cached(self):
+        self.assertEqual(self.adapter.get_app(self.request, 'facebook'), self.app)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.adapter.get_app(self.request, 'facebook'), self.app)
+            self.assertEqual(self.adapter.get_provider(self.request, 'facebook').app, self.app)
+
+    def test_cache_is_cleared_on_change(self):
+        self.adapter.get_app(self.request, 'facebook')
+        self.app.client_id = 'abc'
+        self.app.save()
+        self.assertEqual(self.adapter.get_app(self.request, 'facebook').client_id, 'abc')
+
+        self.app.sites.remove(self.site)
+        with self.assertRaises(SocialApp.DoesNotExist):
+            self.adapter.get_app(self.request, 'facebook')
+
+        self.app.sites.add(self.site)
+        self.adapter.get_app(self.request, 'facebook')
+        self.app.delete()
+        with self.assertRaises(SocialApp.DoesNotExist):
+            self.adapter.get_app(self.request, 'facebook')
+
+    def test_cache_is_cleared_by_other_processes(self):
+        self.adapter.get_app(self.request, 'facebook')
+        # Another process saved a social app: only the version in the
+        # shared cache changed.
+        bump_cache_version('social_apps', 'all')
+        with self.assertNumQueries(1):
+            self.adapter.get_app(self.request, 'facebook')
+        with self.assertNumQueries(0):
+            self.adapter.get_app(self.request, 'facebook')
+
+    def test_apps_are_cached_per_site(self):
+        other_site = Site.objects.create(domain='other.example.com', name='other')
+        self.adapter.get_app(self.request, 'facebook')
+        with override_settings(SITE_ID=other_site.pk):
+            with self.assertRaises(SocialApp.DoesNotExist):
+                self.adapter.get_app(self.request, 'facebook')
+
+
+@override_settings(SOCIALACCOUNT_ADAPTER='dj_rest_auth.registration.adapter.SocialAccountAdapter')
+class TestProviderMetadataCache(MockProviderMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        metadata_cache.clear()
+        self.addCleanup(metadata_cache.clear)
+
+    def get_keys(self, kid):
+        credential = jwt.encode({}, 'secret' * 8, algorithm='HS256', headers={'kid': kid})
+        alg, key = jwtkit.fetch_key(credential, f'{self.base_url}/jwks', lambda keys_data, kid: keys_data.get(kid))
+        return key
+
+    def test_openid_configuration_and_keys_are_cached(self):
+        session = get_pooled_session()
+        for _ in range(3):
+            config = session.get(f'{self.base_url}/.well-known/openid-configuration').json()
+            self.assertEqual(session.get(config['jwks_uri']).json(), {'kid-1': 'key-1'})
+            session.get(f'{self.base_url}/me').raise_for_status()
+
+        self.assertEqual(
+            self.server.paths,
+            ['/.well-known/openid-configuration', '/jwks'] + ['/me'] * 3,
+        )
+
+    def test_configured_urls_are_cached(self):
+        with override_api_settings(SOCIAL_METADATA_URLS=(f'{self.base_url}/jwks',)):
+            for _ in range(3):
+                self.assertEqual(self.get_keys('kid-1'), 'key-1')
+        self.assertEqual(self.server.paths, ['/jwks'])
+
+    @override_api_settings(SOCIAL_METADATA_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        session = get_pooled_session()
+        for _ in range(2):
+            session.get(f'{self.base_url}/.well-known/openid-configuration').raise_for_status()
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_concurrent_misses_fetch_once(self):
+        self.server.delay = 0.2
+        url = f'{self.base_url}/.well-known/openid-configuration'
+        results = []
+
+        def fetch():
+            results.append(get_pooled_session().get(url).json())
+
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.server.paths, ['/.well-known/openid-configuration'])
+
+    def test_expiring_document_is_refreshed_in_background(self):
+        url = f'{self.base_url}/.well-known/openid-configuration'
+        session = get_pooled_session()
+        session.get(url)
+        self.server.delay = 0.2
+
+        with mock.patch.object(metadata_cache, 'refresh_ratio', 0):
+            start = time.monotonic()
+            session.get(url).raise_for_status()
+            # the cached copy was served without waiting for the provider
+            self.assertLess(time.monotonic() - start, 0.2)
+        for _ in range(50):
+            if len(self.server.paths) == 2:
+                break
+            time.sleep(0.05)
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_unknown_key_refetches_keys(self):
+        with override_api_settings(SOCIAL_METADATA_URLS=(f'{self.base_url}/jwks',)):
+            self.assertEqual(self.get_keys('kid-1'), 'key-1')
+            self.server.keys = {'kid-2': 'key-2'}
+
+            with self.assertRaises(OAuth2Error):
+                self.get_keys('kid-2')
+            # the keys were fetched too recently to be refetched
+            self.assertFalse(metadata_cache.refetch_served())
+
+            with self.assertRaises(OAuth2Error):
+                self.get_keys('kid-2')
+            with mock.patch.object(metadata_cache, 'min_refetch_interval', 0):
+                self.assertTrue(metadata_cache.refetch_served())
+            self.assertEqual(self.get_keys('kid-2'), 'key-2')
+
+        self.assertEqual(self.server.paths, ['/jwks', '/jwks'])
+
+
+@override_settings(
+    ROOT_URLCONF='tests.urls',
+    SOCIALACCOUNT_ADAPTER='dj_rest_auth.registration.adapter.SocialAccountAdapter',
+    SOCIALACCOUNT_QUERY_EMAIL=True,
+)
+class TestPrefetchedProviderCalls(MockProviderMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for provider in ('facebook', 'github', 'linkedin_oauth2'):
+            social_app = SocialApp.objects.create(
+                provider=provider, name=provider, client_id='123123123', secret='321321321',
+            )
+            social_app.sites.add(Site.objects.get_current())
+        for adapter, urls in [
+            (MockProviderAdapter, [('profile_url', '/me'), ('emails_url', '/emails')]),
+            (GitHubOAuth2Adapter, [('profile_url', '/user'), ('emails_url', '/user/emails')]),
+            (LinkedInOAuth2Adapter, [('profile_url', '/v2/me'), ('email_url', '/v2/emailAddress')]),
+        ]:
+            for name, path in urls:
+                patcher = mock.patch.object(adapter, name, f'{self.base_url}{path}')
+                patcher.start()
+                self.addCleanup(patcher.stop)
+
+    def login(self, url_name):
+        response = self.client.post(reverse(url_name), {'access_token': 'token1234'})
+        self.assertEqual(response.status_code, 200)
+
+    def expect_concurrent_requests(self, count):
+        # Fails the login unless `count` requests reach the provider at the
+        # same time.
+        self.server.barrier = threading.Barrier(count, timeout=5)
+
+    def test_provider_calls_are_sent_concurrently(self):
+        self.expect_concurrent_requests(2)
+        self.login('mock_prefetch_login')
+        self.assertCountEqual(self.server.paths, ['/me', '/emails'])
+        self.assertTrue(get_user_model().objects.filter(email='john@example.com').exists())
+
+    def test_github_calls_are_sent_concurrently(self):
+        self.expect_concurrent_requests(2)
+        self.login('rest_github_login')
+        # Each call is sent once: allauth got the prefetched responses.
+        self.assertCountEqual(self.server.paths, ['/user', '/user/emails'])
+        self.assertTrue(get_user_model().objects.filter(email='john@example.com').exists())
+
+    def test_linkedin_calls_are_sent_concurrently(self):
+        self.expect_concurrent_requests(2)
+        self.login('rest_linkedin_login')
+        self.assertEqual(sorted(path.split('?')[0] for path in self.server.paths), ['/v2/emailAddress', '/v2/me'])
+
+    def assert_prefetch_hits(self, url_name):
+        # Fails when allauth changes the requests of the provider: every
+        # prefetched response must be used, and no call sent twice.
+        sessions = []
+        get_requests_session = PrefetchMixin.get_requests_session
+
+        def record_session(adapter):
+            session = get_requests_session(adapter)
+            sessions.append(session)
+            return session
+
+        with mock.patch.object(PrefetchMixin, 'get_requests_session', record_session):
+            self.login(url_name)
+        prefetched = [session for session in sessions if isinstance(session, PrefetchedSession)]
+        self.assertTrue(prefetched, 'Nothing was prefetched.')
+        self.assertEqual(prefetched[-1].responses, {})
+        self.assertEqual(len(self.server.paths), len(set(self.server.paths)))
+
+    def test_builtin_prefetch_requests_are_tested(self):
+        self.assertCountEqual(builtin_prefetch_requests, ['github', 'linkedin_oauth2'])
+
+    def test_github_prefetch_matches_allauth(self):
+        self.assert_prefetch_hits('rest_github_login')
+
+    def test_linkedin_prefetch_matches_allauth(self):
+        self.assert_prefetch_hits('rest_linkedin_login')
+
+    def test_overridden_adapter_is_not_prefetched(self):
+        def get_emails(adapter, headers):
+            return None
+
+        with mock.patch.object(GitHubOAuth2Adapter, 'get_emails', get_emails):
+            self.login('rest_github_login')
+        self.assertEqual(self.server.paths, ['/user'])
+
+    def test_social_login_completed_signal(self):
+        calls = []
+
+        def receiver(sender, provider, duration, **kwargs):
+            calls.append((provider, duration))
+
+        social_login_completed.connect(receiver)
+        self.addCleanup(social_login_completed.disconnect, receiver)
+        self.login('mock_login')
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][0], 'facebook')
+        self.assertGreater(calls[0][1], 0)
+
+    def test_provider_calls_without_prefetch(self):
+        self.login('mock_login')
+        self.assertEqual(self.server.paths, ['/me', '/emails'])
+
+
 @override_settings(ROOT_URLCONF='tests.urls')
 class TestSocialAuth(TestsMixin, TestCase):
 
@@ -137,6 +499,49 @@ class TestSocialAuth(TestsMixin, TestCase):
         self.assertIn('key', self.response.json.keys())
         self.assertEqual(get_user_model().objects.all().count(), users_count + 1)
 
+    def _facebook_login(self):
+        responses.add(
+            responses.GET,
+            self.graph_api_url,
+            body=json.dumps({'id': '123123123123', 'first_name': 'John', 'verified': True}),
+            status=200,
+            content_type='application/json',
+        )
+        self.post(self.fb_login_url, data={'access_token': 'abc123'}, status_code=200)
+        self.assertIn('key', self.response.json.keys())
+
+    @responses.activate
+    @override_api_settings(SESSION_LOGIN=False)
+    def test_social_auth_writes_session(self):
+        self._facebook_login()
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.response.cookies)
+        self.assertEqual(Session.objects.count(), 1)
+
+    @responses.activate
+    @override_api_settings(SESSION_LOGIN=False, STATELESS_SOCIAL_LOGIN=True)
+    def test_stateless_social_auth(self):
+        self._facebook_login()
+        self._facebook_login()
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.response.cookies)
+        self.assertNotIn('messages', self.response.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
+    @responses.activate
+    @override_api_settings(SESSION_LOGIN_SKIP_HEADER='X-Token-Only', STATELESS_SOCIAL_LOGIN=True)
+    def test_stateless_social_auth_on_request(self):
+        self.client.defaults['HTTP_X_TOKEN_ONLY'] = '1'
+        self._facebook_login()
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.response.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
+    @_skip_twitter_oauth
+    @responses.activate
+    @override_api_settings(SESSION_LOGIN=False, STATELESS_SOCIAL_LOGIN=True)
+    def test_stateless_twitter_social_auth(self):
+        self._twitter_social_auth()
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.response.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
     def _twitter_social_auth(self):
         # fake response for twitter call
         resp_body = {
@@ -475,3 +880,100 @@ class TestSocialConnectAuth(TestsMixin, TestCase):
         self.get(self.social_account_list_url)
         self.assertEqual(len(self.response.json), 1)
         self.assertEqual(self.response.json[0]['provider'], 'twitter')
+
+
+@override_settings(ROOT_URLCONF='tests.urls')
+class TestSocialAccountViews(TestsMixin, TestCase):
+
+    def setUp(self):
+        self.init()
+        cache.clear()
+        self.user = get_user_model().objects.create_user('person', 'person@world.com', 'person')
+        other = get_user_model().objects.create_user('other', 'other@world.com', 'other')
+        for user, provider in [(self.user, 'facebook'), (self.user, 'twitter'), (other, 'facebook')]:
+            SocialAccount.objects.create(user=user, provider=provider, uid=f'{user.pk}-{provider}', extra_data={'x': 1})
+        self.client.force_login(self.user)
+
+    def test_only_serialized_columns_are_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(self.social_account_list_url, status_code=200)
+        self.assertEqual([account['provider'] for account in self.response.json], ['facebook', 'twitter'])
+        self.assertTrue(any('socialaccount' in query['sql'] for query in queries))
+        self.assertFalse(any('extra_data' in query['sql'] for query in queries))
+
+    def test_conditional_get(self):
+        self.get(self.social_account_list_url, status_code=200)
+        etag = self.response['ETag']
+
+        self.get(self.social_account_list_url, HTTP_IF_NONE_MATCH=etag, status_code=304)
+        self.assertEqual(self.response.content, b'')
+
+        SocialAccount.objects.filter(provider='twitter').delete()
+        self.get(self.social_account_list_url, HTTP_IF_NONE_MATCH=etag, status_code=200)
+        self.assertNotEqual(self.response['ETag'], etag)
+
+    @override_api_settings(SOCIAL_ACCOUNT_LIST_PAGE_SIZE=1)
+    def test_pagination(self):
+        self.get(self.social_account_list_url, status_code=200)
+        self.assertEqual(self.response.json['count'], 2)
+        self.assertEqual(self.response.json['results'][0]['provider'], 'facebook')
+        etag = self.response['ETag']
+
+        self.get(self.social_account_list_url, data={'page': 2}, HTTP_IF_NONE_MATCH=etag, status_code=200)
+        self.assertEqual(self.response.json['results'][0]['provider'], 'twitter')
+
+    @override_api_settings(SOCIAL_ACCOUNT_LIST_CACHE_TIMEOUT=60)
+    def test_cache(self):
+        self.get(self.social_account_list_url, status_code=200)
+        with CaptureQueriesContext(connection) as queries:
+            self.get(self.social_account_list_url, status_code=200)
+        self.assertFalse(any('socialaccount' in query['sql'] for query in queries))
+        self.assertEqual(len(self.response.json), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialAccount.objects.create(user=self.user, provider='google', uid='google')
+        self.get(self.social_account_list_url, status_code=200)
+        self.assertEqual(len(self.response.json), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialAccount.objects.get(provider='google').delete()
+        self.get(self.social_account_list_url, status_code=200)
+        self.assertEqual(len(self.response.json), 2)
+
+    def test_disconnect_other_users_account(self):
+        account = SocialAccount.objects.exclude(user=self.user).get()
+        self.post(reverse('social_account_disconnect', args=[account.pk]), status_code=404)
+        self.assertTrue(SocialAccount.objects.filter(pk=account.pk).exists())
+
+    def test_disconnect_loads_accounts_once(self):
+        account = SocialAccount.objects.get(user=self.user, provider='twitter')
+        seen = []
+
+        def validate_disconnect(adapter, account, accounts):
+            with self.assertNumQueries(0):
+                seen.extend(accounts)
+                self.assertEqual(accounts.count(), 2)
+
+        with mock.patch(
+            'allauth.socialaccount.adapter.DefaultSocialAccountAdapter.validate_disconnect',
+            autospec=True, side_effect=validate_disconnect,
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                self.post(reverse('social_account_disconnect', args=[account.pk]), status_code=200)
+
+        self.assertEqual(len(seen), 2)
+        selects = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "socialaccount_socialaccount"' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertFalse(SocialAccount.objects.filter(pk=account.pk).exists())
+
+    @override_api_settings(SOCIAL_ACCOUNT_LIST_CACHE_TIMEOUT=60)
+    def test_disconnect_invalidates_cache(self):
+        self.get(self.social_account_list_url, status_code=200)
+        account_id = self.response.json[0]['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(reverse('social_account_disconnect', args=[account_id]), status_code=200)
+        self.get(self.social_account_list_url, status_code=200)
+        self.assertEqual([account['provider'] for account in self.response.json], ['twitter'])
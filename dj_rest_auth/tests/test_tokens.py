@@ -0,0 +1,294 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from dj_rest_auth.tokens.authentication import (
+    DeviceTokenAuthentication, ExpiringTokenAuthentication, HashedTokenAuthentication,
+)
+from dj_rest_auth.tokens.last_used import LastUsedBuffer, last_used_buffer
+from dj_rest_auth.tokens.models import DeviceToken, ExpiringToken, HashedToken
+from dj_rest_auth.tokens.utils import hash_key
+from dj_rest_auth.views import LogoutView
+
+from .mixins import TestsMixin
+from .utils import override_api_settings
+
+
+class TestDeviceTokenAuthentication(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('alice', 'alice@example.com', 'password')
+
+    def authenticate(self, key):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key}')
+        return DeviceTokenAuthentication().authenticate(request)
+
+    def test_key_is_stored_hashed(self):
+        token = DeviceToken.objects.create_token(self.user, name='phone')
+        self.assertEqual(len(token.key), 64)
+        stored = DeviceToken.objects.get(pk=token.pk)
+        self.assertIsNone(stored.key)
+        self.assertEqual(stored.key_hash, hash_key(token.key))
+        self.assertNotIn(token.key, stored.key_hash)
+
+    def updates(self, queries):
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+
+    @override_api_settings(TOKEN_LAST_USED_FLUSH_INTERVAL=None)
+    def test_authenticate(self):
+        token = DeviceToken.objects.create_token(self.user)
+        now = timezone.now().replace(second=30)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                    user, auth = self.authenticate(token.key)
+                    # Written once the transaction of the request commits.
+                    self.assertEqual(self.updates(queries), [])
+            self.assertEqual(user, self.user)
+            self.assertEqual(auth.pk, token.pk)
+            self.assertEqual(len(callbacks), 1)
+            self.assertEqual(len(self.updates(queries)), 1)
+            self.assertEqual(DeviceToken.objects.get().last_used, now.replace(second=0, microsecond=0))
+
+            # The use was already recorded for this minute, the lookup is
+            # the only query.
+            with self.assertNumQueries(1):
+                self.authenticate(token.key)
+
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(minutes=1)):
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.authenticate(token.key)
+            self.assertEqual(len(self.updates(queries)), 1)
+
+    @override_api_settings(TOKEN_LAST_USED_FLUSH_INTERVAL=3600, TOKEN_LAST_USED_RESOLUTION=300)
+    def test_last_used_buffered(self):
+        last_used_buffer.flush()
+        tokens = [DeviceToken.objects.create_token(self.user) for _ in range(3)]
+        for token in tokens:
+            with self.assertNumQueries(1):
+                self.authenticate(token.key)
+        self.assertFalse(DeviceToken.objects.filter(last_used__isnull=False).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            last_used_buffer.flush()
+        self.assertEqual(len(self.updates(queries)), 1)
+        last_used = set(DeviceToken.objects.values_list('last_used', flat=True))
+        self.assertEqual(len(last_used), 1)
+        self.assertEqual(last_used.pop().timestamp() % 300, 0)
+
+    @override_api_settings(TOKEN_LAST_USED_FLUSH_INTERVAL=3600)
+    def test_last_used_never_moves_back(self):
+        last_used_buffer.flush()
+        token = DeviceToken.objects.create_token(self.user)
+        self.authenticate(token.key)
+        later = timezone.now() + timedelta(hours=1)
+        DeviceToken.objects.update(last_used=later)
+        last_used_buffer.flush()
+        self.assertEqual(DeviceToken.objects.get().last_used, later)
+
+    @override_api_settings(TOKEN_LAST_USED_FLUSH_INTERVAL=3600)
+    def test_failed_flush_keeps_times(self):
+        last_used_buffer.flush()
+        token = DeviceToken.objects.create_token(self.user)
+        self.authenticate(token.key)
+        with mock.patch('django.db.models.QuerySet.update', side_effect=DatabaseError):
+            last_used_buffer.flush()
+        self.assertIsNone(DeviceToken.objects.get().last_used)
+        last_used_buffer.flush()
+        self.assertIsNotNone(DeviceToken.objects.get().last_used)
+
+    @override_api_settings(TOKEN_LAST_USED_FLUSH_INTERVAL=0.01)
+    def test_flushed_by_worker_thread(self):
+        buffer = LastUsedBuffer()
+        flushed = threading.Event()
+        token = DeviceToken.objects.create_token(self.user)
+        with mock.patch.object(buffer, 'flush', side_effect=flushed.set):
+            buffer.record(token)
+            self.assertTrue(flushed.wait(5))
+
+    def test_invalid_key(self):
+        DeviceToken.objects.create_token(self.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('invalid')
+
+    def test_inactive_user(self):
+        token = DeviceToken.objects.create_token(self.user)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token.key)
+
+
+class TestHashedToken(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('alice', 'alice@example.com', 'password')
+
+    def authenticate(self, key):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key}')
+        return HashedTokenAuthentication().authenticate(request)
+
+    @override_api_settings(TOKEN_LAST_USED_FLUSH_INTERVAL=3600)
+    def test_one_token_per_user(self):
+        last_used_buffer.flush()
+        first = HashedToken.objects.create_token(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(first.key)[0], self.user)
+
+        second = HashedToken.objects.create_token(self.user)
+        self.assertEqual(HashedToken.objects.get().pk, first.pk)
+        self.assertEqual(self.authenticate(second.key)[0], self.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(first.key)
+
+    def test_hash_secret(self):
+        token = HashedToken.objects.create_token(self.user)
+        with override_api_settings(TOKEN_HASH_SECRET='another secret'):
+            self.assertNotEqual(hash_key(token.key), token.key_hash)
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(token.key)
+
+    def test_import_authtoken_tokens(self):
+        other = get_user_model().objects.create_user('bob', 'bob@example.com', 'password')
+        tokens = [Token.objects.create(user=self.user), Token.objects.create(user=other)]
+
+        call_command('import_authtoken_tokens', '--batch-size=1', stdout=StringIO())
+        call_command('import_authtoken_tokens', '--delete', stdout=StringIO())
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(HashedToken.objects.count(), 2)
+        for token in tokens:
+            user, auth = self.authenticate(token.key)
+            self.assertEqual(user, token.user)
+            self.assertEqual(auth.created, token.created)
+
+    def test_import_authtoken_tokens_skips_users_with_hashed_token(self):
+        other = get_user_model().objects.create_user('bob', 'bob@example.com', 'password')
+        HashedToken.objects.create_token(self.user)
+        kept = Token.objects.create(user=self.user)
+        Token.objects.create(user=other)
+
+        out = StringIO()
+        call_command('import_authtoken_tokens', '--delete', stdout=out)
+        self.assertEqual(list(Token.objects.all()), [kept])
+        self.assertIn('Copied 1 tokens', out.getvalue())
+        self.assertIn('Skipped 1 tokens', out.getvalue())
+
+    def test_import_authtoken_tokens_to_device_tokens(self):
+        token = Token.objects.create(user=self.user)
+        call_command('import_authtoken_tokens', '--model=device', stdout=StringIO())
+        self.assertTrue(Token.objects.exists())
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(DeviceTokenAuthentication().authenticate(request)[0], self.user)
+
+
+class TestExpiringToken(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('alice', 'alice@example.com', 'password')
+
+    def setUp(self):
+        last_used_buffer.flush()
+
+    def authenticate(self, key):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key}')
+        return ExpiringTokenAuthentication().authenticate(request)
+
+    @override_api_settings(TOKEN_EXPIRY=3600, TOKEN_RENEWAL_WINDOW=60, TOKEN_LAST_USED_FLUSH_INTERVAL=3600)
+    def test_sliding_expiry(self):
+        now = timezone.now()
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            token = ExpiringToken.objects.create_token(self.user)
+        self.assertEqual(token.expires, now + timedelta(hours=1))
+
+        # Renewed at most once per window.
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(seconds=30)):
+            with self.assertNumQueries(1):
+                self.authenticate(token.key)
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(minutes=50)):
+            with self.assertNumQueries(2):
+                self.authenticate(token.key)
+            with self.assertNumQueries(1):
+                self.authenticate(token.key)
+        self.assertEqual(ExpiringToken.objects.get().expires, now + timedelta(minutes=110))
+
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(minutes=110)):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(token.key)
+
+    @override_api_settings(TOKEN_LAST_USED_FLUSH_INTERVAL=3600)
+    def test_purge_expired_tokens(self):
+        now = timezone.now()
+        for expires in (now - timedelta(days=1), now - timedelta(seconds=1), now + timedelta(hours=1)):
+            ExpiringToken.objects.create_token(self.user, expires=expires)
+
+        call_command('purge_expired_tokens', '--batch-size=1', stdout=StringIO())
+        self.assertEqual(list(ExpiringToken.objects.values_list('expires', flat=True)), [now + timedelta(hours=1)])
+
+
+@override_settings(ROOT_URLCONF='tests.urls')
+class TestDeviceTokenLogin(TestsMixin, TestCase):
+    USERNAME = 'person'
+    PASS = 'person'
+
+    def setUp(self):
+        self.init()
+        self.user = get_user_model().objects.create_user(self.USERNAME, '', self.PASS)
+
+    def login(self, device):
+        payload = {'username': self.USERNAME, 'password': self.PASS}
+        return self.post(self.login_url, data=payload, HTTP_USER_AGENT=device, status_code=200).json['key']
+
+    @override_api_settings(
+        TOKEN_MODEL='dj_rest_auth.tokens.models.DeviceToken',
+        TOKEN_CREATOR='dj_rest_auth.tokens.utils.create_device_token',
+        SESSION_LOGIN=False,
+    )
+    def test_token_per_device(self):
+        phone = self.login('phone')
+        laptop = self.login('laptop')
+        self.assertNotEqual(phone, laptop)
+        self.assertEqual(
+            sorted(DeviceToken.objects.filter(user=self.user).values_list('name', flat=True)), ['laptop', 'phone'],
+        )
+
+        with mock.patch.object(LogoutView, 'authentication_classes', [DeviceTokenAuthentication]):
+            self.token = phone
+            self.post(self.logout_url, status_code=status.HTTP_200_OK)
+        self.assertEqual(list(DeviceToken.objects.values_list('name', flat=True)), ['laptop'])
+        self.assertEqual(DeviceToken.objects.get().key_hash, hash_key(laptop))
+
+    @override_api_settings(
+        TOKEN_MODEL='dj_rest_auth.tokens.models.HashedToken',
+        TOKEN_CREATOR='dj_rest_auth.tokens.utils.create_hashed_token',
+        SESSION_LOGIN=False,
+    )
+    def test_hashed_token(self):
+        first = self.login('phone')
+        second = self.login('laptop')
+        self.assertNotEqual(first, second)
+        self.assertEqual(HashedToken.objects.get(user=self.user).key_hash, hash_key(second))
+
+    @override_api_settings(
+        TOKEN_MODEL='dj_rest_auth.tokens.models.ExpiringToken',
+        TOKEN_CREATOR='dj_rest_auth.tokens.utils.create_expiring_token',
+        SESSION_LOGIN=False,
+    )
+    def test_expiring_token(self):
+        key = self.login('phone')
+        token = ExpiringToken.objects.get(user=self.user)
+        self.assertEqual(token.name, 'phone')
+        self.assertEqual(token.key_hash, hash_key(key))
+        self.assertGreater(token.expires, timezone.now())
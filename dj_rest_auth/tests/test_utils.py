@@ -1,6 +1,20 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.utils import translation
+from django.utils.translation import gettext_lazy as _
+from rest_framework.renderers import JSONRenderer
 
-from dj_rest_auth.utils import format_lazy
+from dj_rest_auth.password_validation import (
+    SharedCommonPasswordValidator, compile_password_list, get_compiled_password_list,
+)
+from dj_rest_auth.renderers import FastJSONRenderer
+from dj_rest_auth.utils import format_lazy, get_detail
 
 
 class TestFormatLazy(TestCase):
@@ -9,3 +23,89 @@ class TestFormatLazy(TestCase):
 
         self.assertNotIsInstance(obj, str)
         self.assertEqual(str(obj), "arst zxcv")
+
+
+class TestGetDetail(TestCase):
+    def test_translated_in_every_shipped_language(self):
+        locale_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'locale')
+        for language in os.listdir(locale_dir):
+            with translation.override(translation.to_language(language)):
+                self.assertEqual(
+                    get_detail('Successfully logged out.'),
+                    {'detail': translation.gettext('Successfully logged out.')},
+                )
+
+    @mock.patch.dict('dj_rest_auth.utils._details', clear=True)
+    def test_translated_once_per_language(self):
+        with mock.patch('dj_rest_auth.utils.gettext', side_effect=translation.gettext) as gettext:
+            for language in ('de', 'fr', 'de', 'fr'):
+                with translation.override(language):
+                    get_detail('New password has been saved.')
+        self.assertEqual(gettext.call_count, 2)
+        with translation.override('de'):
+            detail = get_detail('New password has been saved.')
+        self.assertEqual(detail, {'detail': 'Das neue Passwort wurde gespeichert.'})
+
+
+class TestFastJSONRenderer(TestCase):
+    data = {
+        'detail': _('Successfully logged out.'),
+        'name': 'Zoë \u2028',
+        'expiration': datetime.datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+        'items': [1, 2.5, None, True],
+    }
+
+    def test_same_output_as_json_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indent_uses_json_renderer(self):
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, 'application/json; indent=4'),
+            JSONRenderer().render(self.data, 'application/json; indent=4'),
+        )
+
+    def test_without_orjson(self):
+        with mock.patch('dj_rest_auth.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+
+class TestSharedCommonPasswordValidator(TestCase):
+    def test_rejects_common_passwords(self):
+        validator = SharedCommonPasswordValidator()
+
+        for password in ('password', 'PASSWORD ', '123456', 'zxcvbnm'):
+            with self.assertRaises(ValidationError) as cm:
+                validator.validate(password)
+            self.assertEqual(cm.exception.error_list[0].code, 'password_too_common')
+        validator.validate('vU8mQ#uncommon-enough')
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), 'requires POSIX file ownership')
+    def test_planted_password_list_is_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Another user pre-created the shared directory with an empty list.
+            shared = os.path.join(directory, f'dj-rest-auth-{os.getuid()}')
+            os.mkdir(shared)
+            os.chmod(shared, 0o777)
+            with mock.patch('tempfile.gettempdir', return_value=directory):
+                with mock.patch('dj_rest_auth.password_validation._private_directory', None):
+                    planted = os.path.join(shared, os.path.basename(get_compiled_password_list()))
+                    open(planted, 'w').close()
+                    path = get_compiled_password_list()
+            self.assertFalse(path.startswith(shared))
+            with self.assertRaises(ValidationError):
+                SharedCommonPasswordValidator(password_list_path=path).validate('password')
+
+    def test_custom_password_list(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'source.txt')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write('Zebra\napple\n\nmango\nzèbre\n')
+            compiled = compile_password_list(source, os.path.join(directory, 'compiled.txt'))
+            validator = SharedCommonPasswordValidator(password_list_path=compiled)
+
+            for password in ('apple', 'mango', 'zebra', 'ZÈBRE'):
+                with self.assertRaises(ValidationError):
+                    validator.validate(password)
+            for password in ('', 'a', 'banana', 'zzz'):
+                validator.validate(password)
@@ -1,4 +1,7 @@
+from allauth.socialaccount.adapter import get_adapter as get_social_adapter
 from allauth.socialaccount.providers.facebook.views import FacebookOAuth2Adapter
+from allauth.socialaccount.providers.github.views import GitHubOAuth2Adapter
+from allauth.socialaccount.providers.linkedin_oauth2.views import LinkedInOAuth2Adapter
 from allauth.socialaccount.providers.twitter.views import TwitterOAuthAdapter
 from django.urls import include, re_path
 from django.views.decorators.csrf import ensure_csrf_cookie
@@ -12,8 +15,8 @@ from rest_framework_simplejwt.views import TokenVerifyView
 
 from dj_rest_auth.jwt_auth import get_refresh_view
 from dj_rest_auth.registration.views import (
-    SocialAccountDisconnectView, SocialAccountListView, SocialConnectView,
-    SocialLoginView, RegisterView
+    BulkRegisterView, SocialAccountDisconnectView, SocialAccountListView,
+    SocialConnectView, SocialLoginView, RegisterView
 )
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from dj_rest_auth.social_serializers import (
@@ -38,6 +41,41 @@ class FacebookLogin(SocialLoginView):
     adapter_class = FacebookOAuth2Adapter
 
 
+class GitHubLogin(SocialLoginView):
+    adapter_class = GitHubOAuth2Adapter
+
+
+class LinkedInLogin(SocialLoginView):
+    adapter_class = LinkedInOAuth2Adapter
+
+
+class MockProviderAdapter(FacebookOAuth2Adapter):
+    """
+    Adapter fetching the profile and the e-mails one after the other, from
+    the URLs of the mock provider set by the tests.
+    """
+    profile_url = None
+    emails_url = None
+
+    def complete_login(self, request, app, token, **kwargs):
+        session = get_social_adapter().get_requests_session()
+        headers = {'Authorization': f'Bearer {token.token}'}
+        extra_data = session.get(self.profile_url, headers=headers).json()
+        extra_data['emails'] = session.get(self.emails_url, headers=headers).json()
+        return self.get_provider().sociallogin_from_response(request, extra_data)
+
+
+class MockProviderLogin(SocialLoginView):
+    adapter_class = MockProviderAdapter
+
+
+class MockProviderPrefetchLogin(MockProviderLogin):
+
+    def get_prefetch_requests(self, adapter, token):
+        headers = {'Authorization': f'Bearer {token.token}'}
+        return [(adapter.profile_url, headers), (adapter.emails_url, headers)]
+
+
 class TwitterLogin(SocialLoginView):
     adapter_class = TwitterOAuthAdapter
     serializer_class = TwitterLoginSerializer
@@ -97,6 +135,7 @@ def get_csrf_cookie(request):
 
 urlpatterns += [
     re_path(r'^rest-registration/', include('dj_rest_auth.registration.urls')),
+    re_path(r'^rest-registration-bulk/$', BulkRegisterView.as_view(), name='rest_bulk_register'),
     re_path(r'^rest-registration-no-password/', NoPasswordRegisterView.as_view(), name="no_password_rest_register"),
     re_path(r'^test-admin/', include(django_urls)),
     re_path(
@@ -109,6 +148,10 @@ urlpatterns += [
     ),
     re_path(r'^social-login/facebook/$', FacebookLogin.as_view(), name='fb_login'),
     re_path(r'^social-login/twitter/$', TwitterLogin.as_view(), name='tw_login'),
+    re_path(r'^social-login/github/$', GitHubLogin.as_view(), name='rest_github_login'),
+    re_path(r'^social-login/linkedin/$', LinkedInLogin.as_view(), name='rest_linkedin_login'),
+    re_path(r'^social-login/mock/$', MockProviderLogin.as_view(), name='mock_login'),
+    re_path(r'^social-login/mock/prefetch/$', MockProviderPrefetchLogin.as_view(), name='mock_prefetch_login'),
     re_path(r'^social-login/twitter-no-view/$', twitter_login_view, name='tw_login_no_view'),
     re_path(r'^social-login/twitter-no-adapter/$', TwitterLoginNoAdapter.as_view(), name='tw_login_no_adapter'),
     re_path(r'^social-login/facebook/connect/$', FacebookConnect.as_view(), name='fb_connect'),
@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from .models import DeviceToken, ExpiringToken, HashedToken
+
+
+@admin.register(DeviceToken)
+class DeviceTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'created', 'last_used')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('created', 'last_used')
+
+
+@admin.register(HashedToken)
+class HashedTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created', 'last_used')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('created', 'last_used')
+
+
+@admin.register(ExpiringToken)
+class ExpiringTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'created', 'last_used', 'expires')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('created', 'last_used')
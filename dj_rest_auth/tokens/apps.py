@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class TokensConfig(AppConfig):
+    name = 'dj_rest_auth.tokens'
+    label = 'dj_rest_auth_tokens'
+    verbose_name = _('Tokens')
+    default_auto_field = 'django.db.models.BigAutoField'
@@ -0,0 +1,113 @@
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from dj_rest_auth.app_settings import api_settings
+
+
+def truncate(value, resolution):
+    """
+    Round `value` down to a multiple of `resolution` seconds.
+    """
+    if not resolution:
+        return value
+    timestamp = value.timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % resolution, tz=value.tzinfo)
+
+
+class LastUsedBuffer:
+    """
+    Process-wide buffer of the times tokens were last used.
+
+    Times are rounded down to TOKEN_LAST_USED_RESOLUTION seconds, so a
+    token is recorded at most once per period however many requests it
+    authenticates. Recorded times are kept in memory and written every
+    TOKEN_LAST_USED_FLUSH_INTERVAL seconds by a background thread, with its
+    own database connection, with one UPDATE per model and period for all
+    the tokens used in it. Without a flush interval they are written once
+    the transaction of the request commits.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker_pid = None
+
+    def record(self, token):
+        last_used = truncate(timezone.now(), api_settings.TOKEN_LAST_USED_RESOLUTION)
+        if token.last_used is not None and token.last_used >= last_used:
+            return
+        token.last_used = last_used
+
+        key = (type(token), token.pk)
+        with self._lock:
+            if self._pending.get(key) == last_used:
+                return
+            self._pending[key] = last_used
+
+        if api_settings.TOKEN_LAST_USED_FLUSH_INTERVAL:
+            self._start_worker()
+        else:
+            transaction.on_commit(self.flush, using=type(token).objects.db)
+
+    def _start_worker(self):
+        # Checked against the pid, forked workers don't inherit the thread.
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='dj-rest-auth-last-used', daemon=True).start()
+            self._worker_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(api_settings.TOKEN_LAST_USED_FLUSH_INTERVAL or 1)
+            try:
+                self.flush()
+            except Exception:
+                # Keep the thread alive, unwritten times stay buffered.
+                pass
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        """
+        Write the recorded times to the database. Times which couldn't be
+        written are kept for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        updates = defaultdict(list)
+        for (model, pk), last_used in pending.items():
+            updates[model, last_used].append(pk)
+        for (model, last_used), pks in updates.items():
+            try:
+                # Never move the time back, another process may have written
+                # a later one.
+                with transaction.atomic(using=model.objects.db):
+                    model.objects.filter(pk__in=pks).filter(
+                        Q(last_used__isnull=True) | Q(last_used__lt=last_used),
+                    ).update(last_used=last_used)
+            except DatabaseError:
+                self._restore(model, pks, last_used)
+
+    def _restore(self, model, pks, last_used):
+        with self._lock:
+            for pk in pks:
+                recorded = self._pending.get((model, pk))
+                if recorded is None or recorded < last_used:
+                    self._pending[model, pk] = last_used
+
+
+last_used_buffer = LastUsedBuffer()
+
+atexit.register(last_used_buffer.flush)
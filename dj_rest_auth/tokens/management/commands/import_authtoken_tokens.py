@@ -0,0 +1,81 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dj_rest_auth.tokens.models import DeviceToken, HashedToken
+from dj_rest_auth.tokens.utils import hash_key
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the tokens of rest_framework.authtoken into a hashed token model. '
+        'The clients keep their keys, only the hash of each key is stored.'
+    )
+    models = {'hashed': HashedToken, 'device': DeviceToken}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', choices=sorted(self.models), default='hashed',
+            help='Model the tokens are copied to: HashedToken or DeviceToken (default: hashed).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of tokens copied per transaction (default: 1000).',
+        )
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Delete the plain text tokens once they are copied.',
+        )
+
+    def handle(self, *args, **options):
+        if not apps.is_installed('rest_framework.authtoken'):
+            raise CommandError('rest_framework.authtoken is not installed, there are no tokens to import.')
+        from rest_framework.authtoken.models import Token
+
+        model = self.models[options['model']]
+        batch_size = options['batch_size']
+
+        started = time.monotonic()
+        copied = present = skipped = 0
+        last_key = ''
+        while True:
+            # Keyset pagination: every batch is a range scan of the primary key.
+            rows = list(
+                Token.objects.filter(key__gt=last_key).order_by('key')
+                .values_list('key', 'user_id', 'created')[:batch_size]
+            )
+            if not rows:
+                break
+            hashes = {key: hash_key(key) for key, user_id, created in rows}
+            with transaction.atomic():
+                stored = set(model.objects.filter(key_hash__in=hashes.values()).values_list('key_hash', flat=True))
+                # Users which already have a HashedToken are skipped.
+                model.objects.bulk_create(
+                    [
+                        model(key_hash=hashes[key], user_id=user_id, created=created)
+                        for key, user_id, created in rows if hashes[key] not in stored
+                    ],
+                    ignore_conflicts=True,
+                )
+                imported = set(model.objects.filter(key_hash__in=hashes.values()).values_list('key_hash', flat=True))
+                if options['delete']:
+                    # Only the keys which can be used with the new model.
+                    Token.objects.filter(
+                        key__in=[key for key, key_hash in hashes.items() if key_hash in imported],
+                    ).delete()
+            copied += len(imported) - len(stored)
+            present += len(stored)
+            skipped += len(rows) - len(imported)
+            last_key = rows[-1][0]
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Copied {copied} tokens to {model.__name__} in {elapsed:.2f}s, {present} were already copied.',
+        ))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Skipped {skipped} tokens of users which already have a {model.__name__}, '
+                f'they were kept in rest_framework.authtoken.',
+            ))
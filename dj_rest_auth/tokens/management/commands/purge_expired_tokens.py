@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dj_rest_auth.tokens.models import ExpiringToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the expired ExpiringTokens in small batches, so the table is '
+        'never locked for long.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of tokens deleted per statement (default: 1000).',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to wait between two batches, e.g. to let replicas catch up (default: 0).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+
+        started = time.monotonic()
+        deleted = 0
+        while True:
+            # The primary keys are read from the index of the expiry first:
+            # every DELETE then only locks the rows of its batch.
+            pks = list(
+                ExpiringToken.objects.filter(expires__lte=now).order_by('expires')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            deleted += ExpiringToken.objects.filter(pk__in=pks, expires__lte=now).delete()[0]
+            if len(pks) < batch_size:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired tokens in {elapsed:.2f}s.'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='Key hash')),
+                ('name', models.CharField(blank=True, max_length=255, verbose_name='Device')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('last_used', models.DateTimeField(blank=True, null=True, verbose_name='Last used')),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='device_tokens',
+                    to=settings.AUTH_USER_MODEL, verbose_name='User',
+                )),
+            ],
+            options={
+                'verbose_name': 'Device token',
+                'verbose_name_plural': 'Device tokens',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_rest_auth_tokens', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicetoken',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Created'),
+        ),
+        migrations.CreateModel(
+            name='HashedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='Key hash')),
+                ('created', models.DateTimeField(
+                    default=django.utils.timezone.now, editable=False, verbose_name='Created',
+                )),
+                ('user', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='hashed_token',
+                    to=settings.AUTH_USER_MODEL, verbose_name='User',
+                )),
+            ],
+            options={
+                'verbose_name': 'Hashed token',
+                'verbose_name_plural': 'Hashed tokens',
+            },
+        ),
+    ]
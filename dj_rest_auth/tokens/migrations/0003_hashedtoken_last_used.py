@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_rest_auth_tokens', '0002_hashedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hashedtoken',
+            name='last_used',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last used'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:05
+
+import dj_rest_auth.tokens.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_rest_auth_tokens', '0003_hashedtoken_last_used'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiringToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='Key hash')),
+                ('created', models.DateTimeField(
+                    default=django.utils.timezone.now, editable=False, verbose_name='Created',
+                )),
+                ('last_used', models.DateTimeField(blank=True, null=True, verbose_name='Last used')),
+                ('name', models.CharField(blank=True, max_length=255, verbose_name='Device')),
+                ('expires', models.DateTimeField(
+                    db_index=True, default=dj_rest_auth.tokens.models.get_expiry, verbose_name='Expires',
+                )),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='expiring_tokens',
+                    to=settings.AUTH_USER_MODEL, verbose_name='User',
+                )),
+            ],
+            options={
+                'verbose_name': 'Expiring token',
+                'verbose_name_plural': 'Expiring tokens',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_rest_auth_tokens', '0004_expiringtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSession',
+            fields=[
+                ('session_key', models.CharField(
+                    max_length=40, primary_key=True, serialize=False, verbose_name='Session key',
+                )),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                    to=settings.AUTH_USER_MODEL, verbose_name='User',
+                )),
+            ],
+            options={
+                'verbose_name': 'User session',
+                'verbose_name_plural': 'User sessions',
+            },
+        ),
+    ]
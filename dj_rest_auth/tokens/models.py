@@ -0,0 +1,198 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from dj_rest_auth.app_settings import api_settings
+from dj_rest_auth.utils import get_session_model
+
+from .last_used import last_used_buffer
+from .utils import generate_key, hash_key
+
+
+class HashedTokenManager(models.Manager):
+    def create_token(self, user, **fields):
+        """
+        Create a token for `user`. The key is only available, as `key`, on
+        the returned instance.
+        """
+        key = generate_key()
+        token = self.create(user=user, key_hash=hash_key(key), **fields)
+        token._key = key
+        return token
+
+    def get_by_key(self, key):
+        return self.select_related('user').get(key_hash=hash_key(key))
+
+
+class AbstractHashedToken(models.Model):
+    """
+    Base class of the token models storing a keyed hash of their key
+    instead of the key, looked up through its unique index.
+    """
+    key_hash = models.CharField(_('Key hash'), max_length=64, unique=True, editable=False)
+    created = models.DateTimeField(_('Created'), default=timezone.now, editable=False)
+    last_used = models.DateTimeField(_('Last used'), null=True, blank=True)
+
+    objects = HashedTokenManager()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def key(self):
+        """
+        The key of a token created by `create_token`. Keys are not stored,
+        it is None on tokens read from the database.
+        """
+        return getattr(self, '_key', None)
+
+    def touch(self):
+        """
+        Record that the token was just used, see `LastUsedBuffer`.
+        """
+        last_used_buffer.record(self)
+
+
+class OneTokenPerUserManager(HashedTokenManager):
+    def create_token(self, user, **fields):
+        """
+        Create a new token for `user`, replacing their current one. A key
+        can't be returned again, so every login issues a new one.
+        """
+        key = generate_key()
+        fields.update(key_hash=hash_key(key), created=timezone.now())
+        token, _ = self.update_or_create(user=user, defaults=fields)
+        token._key = key
+        return token
+
+
+class HashedToken(AbstractHashedToken):
+    """
+    Authorization token storing a keyed hash of its key, with one token per
+    user like DRF's Token.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, related_name='hashed_token',
+        on_delete=models.CASCADE, verbose_name=_('User'),
+    )
+
+    objects = OneTokenPerUserManager()
+
+    class Meta:
+        verbose_name = _('Hashed token')
+        verbose_name_plural = _('Hashed tokens')
+
+    def __str__(self):
+        return str(self.pk)
+
+
+class DeviceToken(AbstractHashedToken):
+    """
+    Authorization token of one device of a user. Every login creates a new
+    token, so logging a device out leaves the other devices logged in.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='device_tokens',
+        on_delete=models.CASCADE, verbose_name=_('User'),
+    )
+    name = models.CharField(_('Device'), max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = _('Device token')
+        verbose_name_plural = _('Device tokens')
+
+    def __str__(self):
+        return self.name or str(self.pk)
+
+
+def get_expiry():
+    return timezone.now() + timedelta(seconds=api_settings.TOKEN_EXPIRY)
+
+
+class ExpiringToken(AbstractHashedToken):
+    """
+    Authorization token of one device of a user which expires after
+    TOKEN_EXPIRY seconds without being used.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='expiring_tokens',
+        on_delete=models.CASCADE, verbose_name=_('User'),
+    )
+    name = models.CharField(_('Device'), max_length=255, blank=True)
+    expires = models.DateTimeField(_('Expires'), default=get_expiry, db_index=True)
+
+    class Meta:
+        verbose_name = _('Expiring token')
+        verbose_name_plural = _('Expiring tokens')
+
+    def __str__(self):
+        return self.name or str(self.pk)
+
+    def is_expired(self):
+        return self.expires <= timezone.now()
+
+    def renew(self):
+        """
+        Push the expiry back to TOKEN_EXPIRY seconds from now.
+
+        The expiry is only written once it is TOKEN_RENEWAL_WINDOW seconds
+        behind, so a token used on every request is written once per
+        window. The update is conditional: processes renewing the token at
+        the same time only write it once.
+        """
+        expires = get_expiry()
+        renew_before = expires - timedelta(seconds=api_settings.TOKEN_RENEWAL_WINDOW)
+        if self.expires > renew_before:
+            return
+        type(self).objects.filter(pk=self.pk, expires__lte=renew_before).update(expires=expires)
+        self.expires = expires
+
+    def touch(self):
+        self.renew()
+        super().touch()
+
+
+class UserSession(models.Model):
+    """
+    Key of a database session of a user, recorded when the user logs in so
+    that `LogoutAllView` finds their sessions without reading the others.
+    """
+    session_key = models.CharField(_('Session key'), max_length=40, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE, verbose_name=_('User'),
+    )
+
+    class Meta:
+        verbose_name = _('User session')
+        verbose_name_plural = _('User sessions')
+
+
+def _record_session(sender, request, user, **kwargs):
+    session = getattr(request, 'session', None)
+    session_model = get_session_model()
+    if session_model is None or getattr(session, 'get_model_class', None) is None or not session.session_key:
+        return
+
+    # Forget the sessions of the user which expired or were replaced since,
+    # the table only grows with the live sessions.
+    session_keys = list(UserSession.objects.filter(user=user).values_list('session_key', flat=True))
+    if session_keys:
+        live = session_model.objects.filter(session_key__in=session_keys, expire_date__gt=timezone.now())
+        ended = set(session_keys).difference(live.values_list('session_key', flat=True))
+        if ended:
+            UserSession.objects.filter(session_key__in=ended).delete()
+    UserSession.objects.bulk_create([UserSession(session_key=session.session_key, user=user)], ignore_conflicts=True)
+
+
+def _forget_session(sender, request, user, **kwargs):
+    session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+    if session_key:
+        UserSession.objects.filter(session_key=session_key).delete()
+
+
+user_logged_in.connect(_record_session, dispatch_uid='dj_rest_auth_record_session')
+user_logged_out.connect(_forget_session, dispatch_uid='dj_rest_auth_forget_session')
@@ -0,0 +1,55 @@
+import secrets
+
+from django.utils.crypto import salted_hmac
+
+from dj_rest_auth.app_settings import api_settings
+
+
+def generate_key():
+    return secrets.token_hex(32)
+
+
+def hash_key(key):
+    """
+    Return the keyed hash of the token `key` stored in the database.
+
+    Keys are random, so a fast HMAC-SHA256 is enough to make a leaked table
+    useless without the secret. Unlike a slow password hash, it keeps the
+    authentication of every request cheap.
+
+    The secret is TOKEN_HASH_SECRET, or SECRET_KEY when it isn't set.
+    Changing it invalidates every token.
+    """
+    return salted_hmac(
+        'dj_rest_auth.tokens', key, secret=api_settings.TOKEN_HASH_SECRET, algorithm='sha256',
+    ).hexdigest()
+
+
+def get_device_name(request):
+    if request is None:
+        return ''
+    return request.META.get('HTTP_USER_AGENT', '')[:255]
+
+
+def create_hashed_token(token_model, user, serializer):
+    """
+    TOKEN_CREATOR for `HashedToken`: replaces the token of the user with a
+    new one on every login.
+    """
+    return token_model.objects.create_token(user)
+
+
+def create_device_token(token_model, user, serializer):
+    """
+    TOKEN_CREATOR for `DeviceToken`: creates a new token on every login,
+    named after the User-Agent of the client.
+    """
+    return token_model.objects.create_token(user, name=get_device_name(serializer.context.get('request')))
+
+
+def create_expiring_token(token_model, user, serializer):
+    """
+    TOKEN_CREATOR for `ExpiringToken`: creates a new token on every login,
+    named after the User-Agent of the client.
+    """
+    return create_device_token(token_model, user, serializer)
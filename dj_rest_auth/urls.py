@@ -3,7 +3,7 @@ from django.urls import re_path
 from dj_rest_auth.app_settings import api_settings
 
 from dj_rest_auth.views import (
-    LoginView, LogoutView, PasswordChangeView, PasswordResetConfirmView,
+    LoginView, LogoutAllView, LogoutView, PasswordChangeView, PasswordResetConfirmView,
     PasswordResetView, UserDetailsView,
 )
 
@@ -14,6 +14,7 @@ urlpatterns = [
     re_path(r'password/reset/confirm/?$', PasswordResetConfirmView.as_view(), name='rest_password_reset_confirm'),
     re_path(r'login/?$', LoginView.as_view(), name='rest_login'),
     # URLs that require a user to be logged in with a valid session / token.
+    re_path(r'logout/all/?$', LogoutAllView.as_view(), name='rest_logout_all'),
     re_path(r'logout/?$', LogoutView.as_view(), name='rest_logout'),
     re_path(r'user/?$', UserDetailsView.as_view(), name='rest_user_details'),
     re_path(r'password/change/?$', PasswordChangeView.as_view(), name='rest_password_change'),
@@ -1,4 +1,16 @@
+import hashlib
+import json
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.messages.storage.base import BaseStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import cache
+from django.core.signals import setting_changed
 from django.utils.functional import lazy
+from django.utils.http import quote_etag
+from django.utils.translation import get_language, gettext
 
 
 def default_create_token(token_model, user, serializer):
@@ -20,3 +32,130 @@ def format_lazy(s, *args, **kwargs):
 
 
 format_lazy = lazy(format_lazy, str)
+
+
+_details = {}
+
+
+def get_detail(message):
+    """
+    Return the data of a response with a constant detail message, the
+    untranslated `message` marked with `gettext_noop`, translated into the
+    active language. Each message is translated once per language, later
+    responses only look the translation up.
+    """
+    key = (get_language(), message)
+    try:
+        detail = _details[key]
+    except KeyError:
+        detail = _details[key] = gettext(message)
+    return {'detail': detail}
+
+
+def _clear_details(setting, **kwargs):
+    if setting in ('LANGUAGES', 'LANGUAGE_CODE', 'LOCALE_PATHS'):
+        _details.clear()
+
+
+setting_changed.connect(_clear_details, dispatch_uid='dj_rest_auth_clear_details')
+
+
+def get_versioned_cache_key(prefix, pk):
+    """
+    Return the cache key of the data `prefix` of the object `pk`, in its
+    current version.
+    """
+    version = cache.get(f'dj_rest_auth:{prefix}_version:{pk}', 0)
+    return f'dj_rest_auth:{prefix}:{pk}:{version}'
+
+
+def bump_cache_version(prefix, pk):
+    """
+    Invalidate the cached data `prefix` of the object `pk` by moving to a
+    new version of its cache key, so data computed concurrently from the
+    previous state is never served.
+    """
+    version_key = f'dj_rest_auth:{prefix}_version:{pk}'
+    cache.add(version_key, 0, None)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        # The key was evicted in between.
+        cache.set(version_key, 1, None)
+
+
+def get_etag(data):
+    """
+    Return a strong ETag of the JSON-serializable `data`, independent of the
+    order of its keys.
+    """
+    content = json.dumps(data, sort_keys=True, default=str)
+    return quote_etag(hashlib.md5(content.encode(), usedforsecurity=False).hexdigest())
+
+
+def get_session_model():
+    """
+    Return the model of the session engine, or None when its sessions
+    aren't kept in the database.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    if not hasattr(engine.SessionStore, 'get_model_class'):
+        return None
+    return engine.SessionStore.get_model_class()
+
+
+class EphemeralSession(SessionBase):
+    """
+    Session living in memory for the duration of a request, never loaded
+    from nor saved to the session store.
+    """
+
+    def exists(self, session_key):
+        return False
+
+    def create(self):
+        self.modified = True
+
+    def save(self, must_create=False):
+        pass
+
+    def delete(self, session_key=None):
+        pass
+
+    def load(self):
+        return {}
+
+
+class EphemeralMessageStorage(BaseStorage):
+    """
+    Message storage dropping the messages of the request.
+    """
+
+    def _get(self, *args, **kwargs):
+        return [], True
+
+    def _store(self, messages, response, *args, **kwargs):
+        return []
+
+
+@contextmanager
+def ephemeral_session(request):
+    """
+    Give `request` an `EphemeralSession`, and a message storage dropping
+    its messages, for the duration of the block. Whatever the block stores
+    in the session, like a login, is thrown away afterwards: the session of
+    the request is neither saved nor sent back to the client.
+    """
+    missing = object()
+    session = getattr(request, 'session', missing)
+    messages = getattr(request, '_messages', missing)
+    request.session = EphemeralSession()
+    request._messages = EphemeralMessageStorage(request)
+    try:
+        yield request.session
+    finally:
+        for name, value in (('session', session), ('_messages', messages)):
+            if value is missing:
+                delattr(request, name)
+            else:
+                setattr(request, name, value)
@@ -1,11 +1,20 @@
+from importlib import import_module
+
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth import login as django_login
 from django.contrib.auth import logout as django_logout
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache, caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models.signals import post_save
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django.utils.translation import gettext_lazy as _
+from django.utils.translation import gettext_noop
 from django.views.decorators.debug import sensitive_post_parameters
 from rest_framework import status
 from rest_framework.generics import GenericAPIView, RetrieveUpdateAPIView
@@ -15,7 +24,12 @@ from rest_framework.views import APIView
 
 from .app_settings import api_settings
 from .models import get_token_model
-from .utils import jwt_encode
+from .renderers import FastJSONRendererMixin
+from .serializers import get_auth_response_data
+from .signals import session_login_skipped
+from .utils import (
+    bump_cache_version, get_detail, get_etag, get_session_model, get_versioned_cache_key, jwt_encode,
+)
 
 
 sensitive_post_parameters_m = method_decorator(
@@ -25,7 +39,7 @@ sensitive_post_parameters_m = method_decorator(
 )
 
 
-class LoginView(GenericAPIView):
+class LoginView(FastJSONRendererMixin, GenericAPIView):
     """
     Check the credentials and return the REST Token
     if the credentials are valid and authenticated.
@@ -50,6 +64,21 @@ class LoginView(GenericAPIView):
     def process_login(self):
         django_login(self.request, self.user)
 
+    def use_session_login(self):
+        """
+        Return whether the user is also logged into the Django session.
+
+        With `SESSION_LOGIN_SKIP_HEADER` set, clients which only use the
+        returned token can send that header to skip the session. Override
+        this to decide otherwise, for instance from the user agent.
+        """
+        if not api_settings.SESSION_LOGIN:
+            return False
+        header = api_settings.SESSION_LOGIN_SKIP_HEADER
+        if header and self.request.headers.get(header, '').lower() in ('1', 'true', 'yes'):
+            return False
+        return True
+
     def get_response_serializer(self):
         if api_settings.USE_JWT:
 
@@ -71,8 +100,10 @@ class LoginView(GenericAPIView):
         elif token_model:
             self.token = api_settings.TOKEN_CREATOR(token_model, self.user, self.serializer)
 
-        if api_settings.SESSION_LOGIN:
+        if self.use_session_login():
             self.process_login()
+        elif api_settings.SESSION_LOGIN:
+            session_login_skipped.send(sender=self.__class__, request=self.request, user=self.user)
 
     def get_response(self):
         serializer_class = self.get_response_serializer()
@@ -101,19 +132,13 @@ class LoginView(GenericAPIView):
                 data['access_expiration'] = access_token_expiration
                 data['refresh_expiration'] = refresh_token_expiration
 
-            serializer = serializer_class(
-                instance=data,
-                context=self.get_serializer_context(),
-            )
+            data = get_auth_response_data(serializer_class, data, self.get_serializer_context())
         elif self.token:
-            serializer = serializer_class(
-                instance=self.token,
-                context=self.get_serializer_context(),
-            )
+            data = get_auth_response_data(serializer_class, self.token, self.get_serializer_context())
         else:
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        response = Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response(data, status=status.HTTP_200_OK)
         if api_settings.USE_JWT:
             from .jwt_auth import set_jwt_cookies
             set_jwt_cookies(response, self.access_token, self.refresh_token)
@@ -128,7 +153,7 @@ class LoginView(GenericAPIView):
         return self.get_response()
 
 
-class LogoutView(APIView):
+class LogoutView(FastJSONRendererMixin, APIView):
     """
     Calls Django logout method and delete the Token object
     assigned to the current User object.
@@ -152,19 +177,16 @@ class LogoutView(APIView):
     def logout(self, request):
         if not (request.auth or api_settings.USE_JWT or api_settings.SESSION_LOGIN):
             return Response(
-                {'detail': _('You should be logged in to logout. Check whether the token is passed.')},
+                get_detail(gettext_noop('You should be logged in to logout. Check whether the token is passed.')),
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        try:
-            request.user.auth_token.delete()
-        except (AttributeError, ObjectDoesNotExist):
-            pass
+        self.delete_token(request)
 
         if api_settings.SESSION_LOGIN:
             django_logout(request)
 
         response = Response(
-            {'detail': _('Successfully logged out.')},
+            get_detail(gettext_noop('Successfully logged out.')),
             status=status.HTTP_200_OK,
         )
 
@@ -188,13 +210,13 @@ class LogoutView(APIView):
                         try:
                             token = RefreshToken(request.COOKIES[api_settings.JWT_AUTH_REFRESH_COOKIE])
                         except KeyError:
-                            response.data = {'detail': _('Refresh token was not included in cookie data.')}
+                            response.data = get_detail(gettext_noop('Refresh token was not included in cookie data.'))
                             response.status_code = status.HTTP_401_UNAUTHORIZED
                     else:
                         try:
                             token = RefreshToken(request.data['refresh'])
                         except KeyError:
-                            response.data = {'detail': _('Refresh token was not included in request data.')}
+                            response.data = get_detail(gettext_noop('Refresh token was not included in request data.'))
                             response.status_code = status.HTTP_401_UNAUTHORIZED
 
                     token.blacklist()
@@ -202,20 +224,129 @@ class LogoutView(APIView):
                     response.data = {'detail': _(str(error))}
                     response.status_code = status.HTTP_401_UNAUTHORIZED
                 except (AttributeError, TypeError):
-                    response.data = {'detail': _('An error has occurred.')}
+                    response.data = get_detail(gettext_noop('An error has occurred.'))
                     response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
 
             elif not cookie_name:
-                message = _(
+                message = gettext_noop(
                     'Neither cookies or blacklist are enabled, so the token '
                     'has not been deleted server side. Please make sure the token is deleted client side.',
                 )
-                response.data = {'detail': message}
+                response.data = get_detail(message)
                 response.status_code = status.HTTP_200_OK
         return response
 
+    def delete_token(self, request):
+        """
+        Delete the token of the user with a single DELETE, by the key of the
+        token the request was authenticated with when there is one. Token
+        models with several tokens per user, one per device, only lose the
+        token of the request.
+        """
+        token_model = get_token_model()
+        if not token_model or not request.user.is_authenticated:
+            return
+        if isinstance(request.auth, token_model):
+            token_model.objects.filter(pk=request.auth.pk).delete()
+        else:
+            try:
+                one_per_user = token_model._meta.get_field('user').one_to_one
+            except FieldDoesNotExist:
+                # Custom token models without a user field can't be looked
+                # up by user.
+                return
+            if one_per_user:
+                token_model.objects.filter(user=request.user).delete()
+
+
+class LogoutAllView(LogoutView):
+    """
+    Logs the current User object out of every device: deletes all its
+    tokens and sessions and blacklists all its outstanding JWT refresh
+    tokens, in one transaction.
+
+    Accepts/Returns nothing.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def logout(self, request):
+        user = request.user
+        with transaction.atomic():
+            self.delete_tokens(user)
+            self.delete_sessions(user)
+            self.blacklist_jwt(user)
+
+        if api_settings.SESSION_LOGIN:
+            django_logout(request)
+
+        response = Response(get_detail(gettext_noop('Successfully logged out.')), status=status.HTTP_200_OK)
+        if api_settings.USE_JWT:
+            from .jwt_auth import unset_jwt_cookies
+            unset_jwt_cookies(response)
+        return response
+
+    def delete_tokens(self, user):
+        token_model = get_token_model()
+        if not token_model:
+            return
+        try:
+            token_model._meta.get_field('user')
+        except FieldDoesNotExist:
+            return
+        token_model.objects.filter(user=user).delete()
+
+    def delete_sessions(self, user):
+        """
+        Delete the sessions of `user` kept in the database.
+
+        Sessions don't store their user in a column: the keys of the
+        sessions of each user are recorded on login, in the `UserSession`
+        model of the optional `dj_rest_auth.tokens` app. Without it, or for
+        engines which can't be listed, like the cache or signed cookies,
+        sessions are left alone.
+        """
+        session_model = get_session_model()
+        if session_model is None or not apps.is_installed('dj_rest_auth.tokens'):
+            return
+        from .tokens.models import UserSession
+
+        user_sessions = UserSession.objects.filter(user=user)
+        session_keys = list(user_sessions.values_list('session_key', flat=True))
+        if not session_keys:
+            return
+        session_model.objects.filter(session_key__in=session_keys).delete()
+        user_sessions.delete()
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if hasattr(store, 'cache_key_prefix'):
+            # Cached database sessions are read from the cache first.
+            caches[settings.SESSION_CACHE_ALIAS].delete_many(
+                [store.cache_key_prefix + session_key for session_key in session_keys],
+            )
+
+    def blacklist_jwt(self, user):
+        if not api_settings.USE_JWT or 'rest_framework_simplejwt.token_blacklist' not in settings.INSTALLED_APPS:
+            return
+        from rest_framework_simplejwt.token_blacklist.models import (
+            BlacklistedToken, OutstandingToken,
+        )
+
+        outstanding = OutstandingToken.objects.filter(
+            user=user, expires_at__gt=timezone.now(), blacklistedtoken__isnull=True,
+        ).values_list('pk', flat=True)
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token_id=pk) for pk in outstanding], ignore_conflicts=True,
+        )
+
+
+def _user_changed(sender, instance, **kwargs):
+    if api_settings.USER_DETAILS_CACHE_TIMEOUT:
+        transaction.on_commit(lambda: bump_cache_version('user_details', instance.pk))
+
 
-class UserDetailsView(RetrieveUpdateAPIView):
+post_save.connect(_user_changed, sender=get_user_model(), dispatch_uid='dj_rest_auth_user_saved')
+
+
+class UserDetailsView(FastJSONRendererMixin, RetrieveUpdateAPIView):
     """
     Reads and updates UserModel fields
     Accepts GET, PUT, PATCH methods.
@@ -225,6 +356,11 @@ class UserDetailsView(RetrieveUpdateAPIView):
     Read-only fields: pk, email
 
     Returns UserModel fields.
+
+    GET accepts a `fields` parameter, a comma separated list of the fields
+    to return. Responses carry an ETag, conditional requests are answered
+    with 304 Not Modified. With `USER_DETAILS_CACHE_TIMEOUT` set, the
+    representation of the user is cached until they are updated.
     """
     serializer_class = api_settings.USER_DETAILS_SERIALIZER
     permission_classes = (IsAuthenticated,)
@@ -232,6 +368,58 @@ class UserDetailsView(RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def get_requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        return {field.strip() for field in fields.split(',')}
+
+    def get_last_modified(self, user):
+        """
+        Return when `user` was last modified, sent as Last-Modified and
+        compared with If-Modified-Since. The user model has no such field by
+        default, override this if yours has one.
+        """
+        return None
+
+    def get_user_data(self, fields=None):
+        timeout = api_settings.USER_DETAILS_CACHE_TIMEOUT
+        if timeout:
+            cache_key = get_versioned_cache_key('user_details', self.request.user.pk)
+            data = cache.get(cache_key)
+            if data is None:
+                data = dict(self.get_serializer(self.get_object()).data)
+                cache.set(cache_key, data, timeout)
+        else:
+            serializer = self.get_serializer(self.get_object())
+            if fields:
+                # Only the requested fields are serialized.
+                for name in set(serializer.fields) - fields:
+                    serializer.fields.pop(name)
+            data = dict(serializer.data)
+        if fields:
+            data = {name: value for name, value in data.items() if name in fields}
+        return data
+
+    def retrieve(self, request, *args, **kwargs):
+        data = self.get_user_data(self.get_requested_fields())
+        etag = get_etag(data)
+        last_modified = self.get_last_modified(request.user)
+        last_modified = last_modified and int(last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        if api_settings.USER_DETAILS_CACHE_TIMEOUT:
+            bump_cache_version('user_details', serializer.instance.pk)
+
     def get_queryset(self):
         """
         Adding this method since it is sometimes called when using
@@ -240,7 +428,7 @@ class UserDetailsView(RetrieveUpdateAPIView):
         return get_user_model().objects.none()
 
 
-class PasswordResetView(GenericAPIView):
+class PasswordResetView(FastJSONRendererMixin, GenericAPIView):
     """
     Calls Django Auth PasswordResetForm save method.
 
@@ -259,12 +447,12 @@ class PasswordResetView(GenericAPIView):
         serializer.save()
         # Return the success message with OK HTTP status
         return Response(
-            {'detail': _('Password reset e-mail has been sent.')},
+            get_detail(gettext_noop('Password reset e-mail has been sent.')),
             status=status.HTTP_200_OK,
         )
 
 
-class PasswordResetConfirmView(GenericAPIView):
+class PasswordResetConfirmView(FastJSONRendererMixin, GenericAPIView):
     """
     Password reset e-mail link is confirmed, therefore
     this resets the user's password.
@@ -286,11 +474,11 @@ class PasswordResetConfirmView(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(
-            {'detail': _('Password has been reset with the new password.')},
+            get_detail(gettext_noop('Password has been reset with the new password.')),
         )
 
 
-class PasswordChangeView(GenericAPIView):
+class PasswordChangeView(FastJSONRendererMixin, GenericAPIView):
     """
     Calls Django Auth SetPasswordForm save method.
 
@@ -309,4 +497,4 @@ class PasswordChangeView(GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response({'detail': _('New password has been saved.')})
+        return Response(get_detail(gettext_noop('New password has been saved.')))
@@ -33,6 +33,7 @@ setup(
     ],
     extras_require={
         'with-social': ['django-allauth[socialaccount]>=64.0.0'],
+        'with-orjson': ['orjson>=3.6'],
     },
     tests_require=[
         'coveralls>=1.11.1',